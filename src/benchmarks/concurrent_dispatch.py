@@ -0,0 +1,61 @@
+"""
+Throughput of concurrent `CmdTree.dispatch` calls of a frozen tree from
+a thread pool, commands wait on I/O like most of the real ones.
+Parsing holds the GIL, so scaling stops once it dominates the time of
+a call.
+
+    python benchmarks/concurrent_dispatch.py
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cmdtree.tree import CmdTree
+from cmdtree.types import INT
+
+CALLS = 800
+IO_SECONDS = 0.002
+
+
+def fetch(resource_id, verbose):
+    time.sleep(IO_SECONDS)
+    return resource_id
+
+
+def build_tree():
+    tree = CmdTree(lazy=True)
+    for group_index in range(20):
+        for cmd_index in range(20):
+            parser = tree.add_commands(
+                ["group%d" % group_index, "cmd%d" % cmd_index], fetch
+            )
+            parser.argument("resource_id", type=INT)
+            parser.option("verbose", is_flag=True)
+    tree.freeze()
+    return tree
+
+
+def measure(tree, workers):
+    args_list = [
+        ["group%d" % (index % 20), "cmd%d" % (index % 7), str(index)]
+        for index in range(CALLS)
+    ]
+    start = time.time()
+    with ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(tree.dispatch, args_list))
+    used = time.time() - start
+    assert results == list(range(CALLS))
+    return CALLS / used
+
+
+def main():
+    tree = build_tree()
+    base = None
+    print("workers    calls/s  speedup")
+    for workers in (1, 2, 4, 8, 16):
+        rate = measure(tree, workers)
+        base = base or rate
+        print("%7d %10.0f %8.2f" % (workers, rate, rate / base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Cost of turning the parsed namespace to keyword arguments, filtering
+it with `vars_` on every call against the mapping precompiled by
+`AParser.get_kwargs_map`, and of a whole `run`.
+
+    python benchmarks/dispatch_overhead.py
+"""
+import timeit
+
+from cmdtree.parser import AParser, vars_
+
+NUMBER = 100000
+
+
+def show(host, disk_id, dry_run, verbose, **options):
+    return disk_id
+
+
+def build_parser():
+    root = AParser()
+    root.argument("host")
+    group = root.add_cmd("disks")
+    group.option("dry-run", is_flag=True)
+    leaf = group.add_cmd("show", func=show)
+    leaf.argument("disk_id")
+    leaf.option("verbose", is_flag=True)
+    for index in range(8):
+        leaf.option("option-%d" % index, default=index)
+    return root, leaf
+
+
+def report(name, seconds):
+    print("%-24s %6.2f us" % (name, seconds / NUMBER * 1e6))
+
+
+def main():
+    root, leaf = build_parser()
+    args = ["localhost", "disks", "show", "1", "--option-3", "x"]
+    namespace = root.parse_args(args)
+    assert vars_(namespace) == leaf._kwargs_of(namespace)
+    report("vars_", timeit.timeit(
+        lambda: vars_(namespace), number=NUMBER
+    ))
+    report("precompiled mapping", timeit.timeit(
+        lambda: leaf._kwargs_of(namespace), number=NUMBER
+    ))
+    report("run", timeit.timeit(
+        lambda: root.run(args), number=NUMBER // 10
+    ) * 10)
+
+
+if __name__ == "__main__":
+    main()
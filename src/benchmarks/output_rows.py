@@ -0,0 +1,56 @@
+"""
+Writing rows returned by a command with `print` in a loop against
+`cmdtree.output.write_rows`, both to devnull through a pipe-like
+(block buffered) stdout. Rows of "lines" are strings, the ones of
+"jsonl" and "csv" are dicts.
+
+    python benchmarks/output_rows.py
+"""
+import io
+import os
+import sys
+import time
+
+from cmdtree.output import write_rows
+
+ROWS = 1000000
+
+
+def lines():
+    return ("disk-%d" % i for i in range(ROWS))
+
+
+def records():
+    return ({"id": i, "name": "disk-%d" % i} for i in range(ROWS))
+
+
+def report(name, seconds):
+    print("%-16s %6.2f s" % (name, seconds))
+
+
+def main():
+    stdout = sys.stdout
+    with open(os.devnull, "wb") as devnull:
+        sys.stdout = io.TextIOWrapper(devnull)
+        try:
+            start = time.time()
+            for row in lines():
+                print(row)
+            printed = time.time() - start
+            results = {}
+            for format, rows in (
+                    ("lines", lines), ("jsonl", records), ("csv", records)
+            ):
+                start = time.time()
+                write_rows(rows(), format)
+                results[format] = time.time() - start
+        finally:
+            sys.stdout.flush()
+            sys.stdout = stdout
+    report("print", printed)
+    for format, seconds in sorted(results.items()):
+        report("write_rows " + format, seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Memory used by the nodes of a 10k commands tree, compared with the
+dict nodes used before `cmdtree.tree.CmdNode`.
+
+    python benchmarks/tree_memory.py
+"""
+import tracemalloc
+
+from cmdtree.tree import CmdNode
+
+GROUPS = 100
+COMMANDS = 100
+
+
+def build_dict_nodes():
+    root = {"name": "root", "cmd": None, "children": {}}
+    for group_index in range(GROUPS):
+        group_name = "group%d" % group_index
+        group = {"name": group_name, "cmd": None, "children": {}}
+        root["children"][group_name] = group
+        for cmd_index in range(COMMANDS):
+            cmd_name = "cmd%d" % cmd_index
+            group["children"][cmd_name] = {
+                "name": cmd_name, "cmd": None, "children": {}
+            }
+    return root
+
+
+def build_slotted_nodes():
+    # same steps as `CmdTree._add_child`, without building parsers
+    root = CmdNode("root", None)
+    nodes = {(): root}
+
+    def add(parent, node):
+        node.path = parent.path + (node.name, )
+        parent.children[node.name] = node
+        nodes[node.path] = node
+        return node
+
+    for group_index in range(GROUPS):
+        group = add(root, CmdNode("group%d" % group_index, None))
+        for cmd_index in range(COMMANDS):
+            add(group, CmdNode("cmd%d" % cmd_index, None))
+    return root, nodes
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used
+
+
+def main():
+    dict_size = measure(build_dict_nodes)
+    slotted_size = measure(build_slotted_nodes)
+    count = GROUPS * COMMANDS + GROUPS + 1
+    print("nodes:          %d" % count)
+    print("dict nodes:     %8d bytes" % dict_size)
+    print("slotted nodes:  %8d bytes (with path index)" % slotted_size)
+    print("saved:          %.1f%%" % (100.0 * (dict_size - slotted_size) / dict_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,17 @@ from cmdtree.types import (
     Choices,
     IntRange,
     File,
+    MMapFile,
+    LazyFile,
+    CompressedFile,
+    Paths,
+    Lines,
+    Records,
+    STREAM,
 )
 
 # globals and entry point
 env.parser = AParser()
 entry = env.entry
+entry_batch = env.entry_batch
 
@@ -1,4 +1,17 @@
 import sys
+import time
+from functools import partial
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # python 2.6
+    from ordereddict import OrderedDict
 
 
 WIN = sys.platform.startswith('win')
@@ -13,4 +26,64 @@ if WIN:
         return locale.getpreferredencoding()
 else:
     def _get_argv_encoding():
-        return getattr(sys.stdin, 'encoding', None) or get_filesystem_encoding()
\ No newline at end of file
+        return getattr(sys.stdin, 'encoding', None) or get_filesystem_encoding()
+
+
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+# same as the ones in inspect, which is too slow to import at startup
+_CO_COROUTINE = 0x80
+_CO_ITERABLE_COROUTINE = 0x100
+
+
+def isawaitable(obj):
+    if hasattr(obj, "__await__"):
+        return True
+    code = getattr(obj, "gi_code", None)
+    return code is not None and bool(code.co_flags & _CO_ITERABLE_COROUTINE)
+
+
+def iscoroutinefunction(func):
+    while isinstance(func, partial):
+        func = func.func
+    code = getattr(func, "__code__", None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
+
+
+try:
+    from contextvars import ContextVar
+except ImportError:
+    import threading
+
+    class ContextVar(object):
+        """
+        Fallback of `contextvars.ContextVar` which is local to thread.
+        """
+        _missing = object()
+
+        def __init__(self, name, default=_missing):
+            self.name = name
+            self._default = default
+            self._local = threading.local()
+
+        def get(self, default=_missing):
+            value = getattr(self._local, "value", self._missing)
+            if value is not self._missing:
+                return value
+            if default is not self._missing:
+                return default
+            if self._default is not self._missing:
+                return self._default
+            raise LookupError(self.name)
+
+        def set(self, value):
+            token = getattr(self._local, "value", self._missing)
+            self._local.value = value
+            return token
+
+        def reset(self, token):
+            if token is self._missing:
+                del self._local.value
+            else:
+                self._local.value = token
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+
+from cmdtree._compat import isawaitable
+from cmdtree.resources import scope
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+
+
+def get_loop():
+    """
+    Return the event loop shared by all of the dispatches.
+    It runs forever in a daemon thread, so resources bound to it
+    (like connection pools of async clients) survive between invocations.
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="cmdtree-event-loop",
+                )
+                thread.daemon = True
+                thread.start()
+                _loop, _thread = loop, thread
+    return _loop
+
+
+def set_loop(loop):
+    """
+    Share a loop which is running forever in another thread
+    instead of the default one.
+    """
+    global _loop, _thread
+    with _lock:
+        _loop, _thread = loop, None
+
+
+def close_loop():
+    """
+    Stop and close the default shared loop, a new one will be created
+    by the next dispatch.
+    """
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop, _thread = None, None
+    if loop is not None and thread is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def run_sync(awaitable):
+    """
+    Wait for the awaitable on the shared loop from synchronous code.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        raise RuntimeError(
+            "Can not block the shared loop, await `run_async` instead"
+        )
+    future = asyncio.run_coroutine_threadsafe(_await(awaitable), loop)
+    return future.result()
+
+
+async def activated(env, awaitable):
+    """
+    Await awaitable with env activated.
+    :type env: cmdtree.registry.ENV
+    """
+    with env.activate():
+        return await awaitable
+
+
+async def then(awaitable, callback):
+    """
+    Await awaitable and return callback of its result.
+    """
+    return callback(await awaitable)
+
+
+async def run_async(parser, args=None, namespace=None):
+    """
+    Parse args with parser then await the command if it is a coroutine.
+    :type parser: cmdtree.parser.AParser
+    """
+    with scope():
+        func, kwargs = parser.parse_cmd(args, namespace)
+        result = func(**kwargs)
+        if isawaitable(result):
+            result = await result
+        return result
@@ -0,0 +1,261 @@
+import functools
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from six.moves import cPickle as pickle
+
+from cmdtree._compat import isawaitable, iscoroutinefunction
+from cmdtree.shortcuts import Cmd, CmdProxy, Group
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = os.environ.get(
+    "CMDTREE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "cmdtree"),
+)
+
+CacheInfo = namedtuple("CacheInfo", ("hits", "misses", "entries", "size"))
+
+# errors of pickling a key or a result which can not be cached
+_PICKLE_ERRORS = (pickle.PicklingError, TypeError, AttributeError)
+
+
+class DiskCache(object):
+    """
+    Pickled values in a directory, one file per key.
+    The modification time of an entry is the time it was last used,
+    the least recently used entries are removed once there are more than
+    max_entries of them or their total size is bigger than max_bytes.
+    Entries are replaced atomically, and writers of the directory are
+    serialized by a lock file, so it can be shared by processes.
+    """
+    suffix = ".cache"
+
+    def __init__(self, path, max_entries=1000, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _get_filename(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    @staticmethod
+    def _touch(filename):
+        now = time.time()
+        try:
+            os.utime(filename, (now, now))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.unlink(filename)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """
+        :return: (found, value)
+        """
+        filename = self._get_filename(key)
+        try:
+            with open(filename, "rb") as f:
+                expires, value = pickle.load(f)
+        except (IOError, OSError, EOFError, ValueError,
+                pickle.UnpicklingError):
+            return False, None
+        if expires is not None and expires <= time.time():
+            self._remove(filename)
+            return False, None
+        self._touch(filename)
+        return True, value
+
+    def set(self, key, value, ttl=None):
+        """
+        :param ttl: seconds before the entry expires, None for never
+        :raise pickle.PicklingError: if value can not be pickled
+        """
+        expires = None if ttl is None else time.time() + ttl
+        data = pickle.dumps((expires, value), pickle.HIGHEST_PROTOCOL)
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                if not os.path.isdir(self.path):
+                    raise
+        with self._lock():
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                filename = self._get_filename(key)
+                getattr(os, "replace", os.rename)(tmp_path, filename)
+            except Exception:
+                self._remove(tmp_path)
+                raise
+            self._touch(filename)
+            self._evict()
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _iter_entries(self):
+        """
+        :return: generator of (mtime, size, filename)
+        """
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(self.suffix):
+                continue
+            filename = os.path.join(self.path, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            yield stat.st_mtime, stat.st_size, filename
+
+    def _evict(self):
+        entries = sorted(self._iter_entries())
+        count = len(entries)
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, filename in entries:
+            if count <= self.max_entries and \
+                    (self.max_bytes is None or size <= self.max_bytes):
+                break
+            self._remove(filename)
+            count -= 1
+            size -= entry_size
+
+    def stats(self):
+        """
+        :return: (number of entries, total size in bytes)
+        """
+        entries = list(self._iter_entries())
+        return len(entries), sum(entry[1] for entry in entries)
+
+    def clear(self):
+        for _, _, filename in list(self._iter_entries()):
+            self._remove(filename)
+
+
+def _get_func_id(func):
+    name = "{module}.{name}".format(
+        module=getattr(func, "__module__", None),
+        name=getattr(func, "__qualname__", None) or func.__name__,
+    )
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def make_key(args, kwargs):
+    """
+    Key of a call, made of the pickled arguments.
+    :raise pickle.PicklingError: if any of the arguments can not be pickled
+    """
+    data = pickle.dumps((args, sorted(kwargs.items())), 2)
+    return hashlib.sha1(data).hexdigest()
+
+
+def cached(ttl=None, max_entries=1000, max_bytes=None, path=None):
+    """
+    Keep results of a command function in an on-disk LRU cache,
+    keyed by the keyword arguments the command is called with. Put it
+    under `command`:
+
+        @command()
+        @cached(ttl=60)
+        def list_disks(zone):
+            ...
+
+    Results and arguments which can not be pickled are not cached,
+    neither are exceptions. It may also be put above `argument` and
+    `option`, their declarations are kept.
+    :param ttl: seconds before a result expires, None for never
+    :param path: directory of the cache, defaults to a directory
+    named after the function in `CACHE_DIR`
+    The decorated function has `cache_info()` returning the hits and
+    misses of this process with the entries and size of the cache, and
+    `cache_clear()` removing all of the entries.
+    """
+    def wrapper(func):
+        if isinstance(func, (Cmd, Group)):
+            raise ValueError(
+                "`cached` should be put under `command` and `group`, "
+                "command `{0}` is already registered".format(func.meta.name)
+            )
+        proxy = None
+        if isinstance(func, CmdProxy):
+            # under `command`, above `argument` or `option`
+            proxy, func = func, func.func
+        if iscoroutinefunction(func):
+            raise ValueError(
+                "Results of coroutine function `{0}` can not be "
+                "cached".format(func)
+            )
+        store = DiskCache(
+            path or os.path.join(CACHE_DIR, _get_func_id(func)),
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+        )
+        counters = {"hits": 0, "misses": 0}
+        lock = threading.Lock()
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        @functools.wraps(func)
+        def cached_func(*args, **kwargs):
+            try:
+                key = make_key(args, kwargs)
+            except _PICKLE_ERRORS:
+                count("misses")
+                return func(*args, **kwargs)
+            found, value = store.get(key)
+            if found:
+                count("hits")
+                return value
+            count("misses")
+            result = func(*args, **kwargs)
+            if not isawaitable(result):
+                try:
+                    store.set(key, result, ttl=ttl)
+                except _PICKLE_ERRORS:
+                    pass
+            return result
+
+        def cache_info():
+            entries, size = store.stats()
+            return CacheInfo(
+                counters["hits"], counters["misses"], entries, size
+            )
+
+        cached_func.cache = store
+        cached_func.cache_info = cache_info
+        cached_func.cache_clear = store.clear
+        if proxy is not None:
+            proxy.func = cached_func
+            return proxy
+        return cached_func
+    return wrapper
@@ -0,0 +1,154 @@
+"""
+Thin client of `cmdtree.server`, forwards argv, cwd, environment and
+stdio to a running server and exits with the status of the command.
+
+    python -m cmdtree.client /path/to/server.sock sub-command args...
+"""
+import errno
+import io
+import json
+import os
+import select
+import socket
+import struct
+import sys
+
+_HEADER = struct.Struct(">cI")
+
+REQUEST = b"r"
+STDIN = b"0"
+STDOUT = b"1"
+STDERR = b"2"
+EXIT = b"x"
+
+CHUNK_SIZE = 64 * 1024
+
+# flag of sending without blocking a blocking socket
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+def _recv_exactly(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError("connection closed")
+        data += chunk
+    return data
+
+
+def read_frame(sock):
+    """
+    :return: (channel, payload)
+    """
+    channel, size = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return channel, _recv_exactly(sock, size)
+
+
+def pack_frame(channel, payload=b""):
+    return _HEADER.pack(channel, len(payload)) + payload
+
+
+def write_frame(sock, channel, payload=b""):
+    sock.sendall(pack_frame(channel, payload))
+
+
+def _send_some(sock, data):
+    """
+    Send the part of data which fits in buffers of sock.
+    :return: number of bytes sent
+    """
+    try:
+        return sock.send(data, _MSG_DONTWAIT)
+    except socket.error as e:
+        if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+            return 0
+        raise
+
+
+def _binary(stream):
+    return getattr(stream, "buffer", stream)
+
+
+def _get_fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def run(path, argv, stdin=None, stdout=None, stderr=None,
+        cwd=None, environ=None):
+    """
+    Run argv on server listening on UNIX socket path.
+    :param stdin, stdout, stderr: binary file objects, default to stdio.
+    :return: exit status of the command
+    """
+    stdin = _binary(sys.stdin) if stdin is None else stdin
+    stdout = _binary(sys.stdout) if stdout is None else stdout
+    stderr = _binary(sys.stderr) if stderr is None else stderr
+    request = {
+        "argv": list(argv),
+        "cwd": os.getcwd() if cwd is None else cwd,
+        "env": dict(os.environ) if environ is None else dict(environ),
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        write_frame(sock, REQUEST, json.dumps(request).encode("utf-8"))
+        stdin_fd = _get_fileno(stdin)
+        # stdin is sent only when sock is writable, a command writing
+        # without reading its input would block on a full socket
+        # if it is sent at once.
+        pending = b""
+        stdin_open = True
+        while True:
+            if stdin_open and not pending and stdin_fd is None:
+                # in-memory stream
+                data = stdin.read(CHUNK_SIZE)
+                pending = pack_frame(STDIN, data)
+                stdin_open = bool(data)
+            readers = [sock]
+            if stdin_open and not pending and stdin_fd is not None:
+                readers.append(stdin_fd)
+            writers = [sock] if pending else []
+            ready, writable, _ = select.select(readers, writers, [])
+            if stdin_fd is not None and stdin_fd in ready:
+                data = os.read(stdin_fd, CHUNK_SIZE)
+                pending = pack_frame(STDIN, data)
+                stdin_open = bool(data)
+            if writable:
+                try:
+                    pending = pending[_send_some(sock, pending):]
+                except (IOError, OSError):
+                    # command finished without reading all of the input
+                    pending = b""
+                    stdin_open = False
+            if sock not in ready:
+                continue
+            channel, payload = read_frame(sock)
+            if channel == STDOUT:
+                stdout.write(payload)
+            elif channel == STDERR:
+                stderr.write(payload)
+                stderr.flush()
+            elif channel == EXIT:
+                stdout.flush()
+                return int(payload)
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv:
+        sys.stderr.write(
+            "usage: python -m cmdtree.client SOCKET_PATH [ARGS ...]\n"
+        )
+        return 2
+    return run(argv[0], argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Shell completion answered from a precomputed index of the command tree.
+Completion scripts run this file directly so a query imports neither
+cmdtree nor any command module:
+
+    python cmdtree/completion.py INDEX_PATH -- WORD... CURRENT_WORD
+"""
+import sys
+
+if __name__ == "__main__":
+    # run as a file, do not let cmdtree/types.py shadow the stdlib one
+    del sys.path[0]
+
+import json
+import os
+
+INDEX_VERSION = 1
+
+
+def _value_spec(action):
+    """
+    :return: completion spec of the values of an argparse action
+    """
+    from cmdtree.types import Choices, ParamTypeFactory
+
+    spec = {}
+    factory = getattr(action.type, "__self__", None)
+    if isinstance(factory, Choices):
+        spec['choices'] = [str(choice) for choice in factory.choices]
+    elif action.choices is not None and not isinstance(action.choices, dict):
+        spec['choices'] = [str(choice) for choice in action.choices]
+    elif isinstance(factory, ParamTypeFactory) and factory.completion:
+        spec['hint'] = factory.completion
+    return spec
+
+
+def _index_node(node):
+    from argparse import _SubParsersAction
+    from cmdtree.parser import LazyAParser
+
+    parser = node['cmd']
+    if isinstance(parser, LazyAParser):
+        parser = parser.materialize()
+    options = {}
+    positionals = []
+    for action in parser._actions:
+        if isinstance(action, _SubParsersAction):
+            continue
+        spec = _value_spec(action)
+        if action.option_strings:
+            spec['takes_value'] = action.nargs != 0
+            for option_string in action.option_strings:
+                options[option_string] = spec
+        else:
+            positionals.append(spec)
+    return {
+        "commands": dict(
+            (name, _index_node(child))
+            for name, child in node['children'].items()
+        ),
+        "options": options,
+        "positionals": positionals,
+    }
+
+
+def build_index(tree):
+    """
+    Build the completion index of the tree, lazy parsers are materialized.
+    :type tree: cmdtree.tree.CmdTree
+    :rtype: dict
+    """
+    return {
+        "version": INDEX_VERSION,
+        "root": _index_node(tree.tree),
+    }
+
+
+def dump_index(tree, path):
+    with open(path, "w") as f:
+        json.dump(build_index(tree), f, separators=(",", ":"))
+
+
+def load_index(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _complete_path(current):
+    dirname, prefix = os.path.split(current)
+    try:
+        names = os.listdir(dirname or ".")
+    except OSError:
+        return []
+    candidates = []
+    for name in sorted(names):
+        if not name.startswith(prefix):
+            continue
+        path = os.path.join(dirname, name)
+        if os.path.isdir(path):
+            path += os.sep
+        candidates.append(path)
+    return candidates
+
+
+def _complete_values(spec, current):
+    if spec.get("hint") == "file":
+        return _complete_path(current)
+    return [
+        choice for choice in spec.get("choices", ())
+        if choice.startswith(current)
+    ]
+
+
+def complete(index, words, current=""):
+    """
+    :param words: completed words after the program name
+    :param current: the word under cursor
+    :return: candidates of current word
+    """
+    node = index['root']
+    expecting = None
+    position = 0
+    for word in words:
+        if expecting is not None:
+            expecting = None
+            continue
+        if word.startswith("-"):
+            spec = node['options'].get(word)
+            if spec is not None and spec.get("takes_value"):
+                expecting = spec
+            continue
+        # sub-commands follow the positionals of group
+        if position >= len(node['positionals']) and \
+                word in node['commands']:
+            node = node['commands'][word]
+            position = 0
+            continue
+        position += 1
+    if expecting is not None:
+        return _complete_values(expecting, current)
+    if current.startswith("--") and "=" in current:
+        option, _, value = current.partition("=")
+        spec = node['options'].get(option)
+        if spec is None or not spec.get("takes_value"):
+            return []
+        return [
+            option + "=" + candidate
+            for candidate in _complete_values(spec, value)
+        ]
+    if current.startswith("-"):
+        return sorted(
+            option for option in node['options']
+            if option.startswith(current)
+        )
+    if position < len(node['positionals']):
+        return _complete_values(node['positionals'][position], current)
+    return sorted(
+        name for name in node['commands'] if name.startswith(current)
+    )
+
+
+_SCRIPTS = {
+    "bash": """\
+_cmdtree_complete_{func}() {{
+    local IFS=$'\\n'
+    COMPREPLY=( $({python} {module} {index} -- \
+"${{COMP_WORDS[@]:1:$COMP_CWORD}}") )
+}}
+complete -F _cmdtree_complete_{func} {prog}
+""",
+    "zsh": """\
+_cmdtree_complete_{func}() {{
+    local -a candidates
+    candidates=("${{(@f)$({python} {module} {index} -- \
+"${{(@)words[2,CURRENT]}}")}}")
+    compadd -a candidates
+}}
+compdef _cmdtree_complete_{func} {prog}
+""",
+    "fish": """\
+function __cmdtree_complete_{func}
+    {python} {module} {index} -- (commandline -opc)[2..-1] (commandline -ct)
+end
+complete -c {prog} -f -a '(__cmdtree_complete_{func})'
+""",
+}
+
+
+def _quote_fish(value):
+    # only backslash and single quote are escaped in single quotes of fish
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _get_quote(shell):
+    if shell == "fish":
+        return _quote_fish
+    try:
+        from shlex import quote
+    except ImportError:
+        from pipes import quote
+    return quote
+
+
+def script(shell, prog, index_path, python=None):
+    """
+    Return the completion script for shell ("bash", "zsh" or "fish")
+    which completes prog with the index file.
+    """
+    if shell not in _SCRIPTS:
+        raise ValueError(
+            "shell should be one of {shells}".format(
+                shells=", ".join(sorted(_SCRIPTS))
+            )
+        )
+    quote = _get_quote(shell)
+    return _SCRIPTS[shell].format(
+        func="".join(char if char.isalnum() else "_" for char in prog),
+        prog=quote(prog),
+        index=quote(os.path.abspath(index_path)),
+        python=quote(python or sys.executable),
+        module=quote(os.path.abspath(__file__).replace(".pyc", ".py")),
+    )
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) < 2 or argv[1] != "--":
+        sys.stderr.write(
+            "usage: completion.py INDEX_PATH -- [WORD ...]\n"
+        )
+        return 2
+    words = argv[2:]
+    current = words.pop() if words else ""
+    try:
+        index = load_index(argv[0])
+    except (IOError, OSError, ValueError):
+        return 1
+    candidates = complete(index, words, current)
+    if candidates:
+        sys.stdout.write("\n".join(candidates) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,28 @@
 class ArgumentParseError(ValueError):
-    pass
\ No newline at end of file
+    pass
+
+
+class MapError(Exception):
+    """
+    Some of the values of a mappable argument failed.
+    """
+
+    def __init__(self, results, failures):
+        """
+        :param results: results in order of values, None for failed ones
+        :param failures: list of (value, exception)
+        """
+        self.results = results
+        self.failures = failures
+        super(MapError, self).__init__(self.summary())
+
+    def summary(self):
+        lines = [
+            "{failed} of {total} items failed:".format(
+                failed=len(self.failures),
+                total=len(self.results),
+            )
+        ]
+        for value, error in self.failures:
+            lines.append("  {value}: {error!r}".format(value=value, error=error))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,154 @@
+import uuid
+
+import six
+
+from cmdtree import types
+from cmdtree.lazy import LazyFunc
+
+# annotation of parameter to its type
+ANNOTATION_TYPES = {
+    int: types.INT,
+    float: types.FLOAT,
+    bool: types.BOOL,
+    uuid.UUID: types.UUID,
+}
+if six.PY2:
+    ANNOTATION_TYPES[six.text_type] = types.STRING
+
+_SEQUENCE_TYPES = (list, tuple, set, frozenset)
+_EMPTY = object()
+
+# {func: inferred calls}, inference runs once per function
+_cache = {}
+
+
+def param_name(name):
+    """
+    Parameter name of an argument or option name like "--dry-run".
+    """
+    return name.lstrip("-").replace("-", "_")
+
+
+def _get_type_hints(func):
+    try:
+        from typing import get_type_hints
+        return get_type_hints(func)
+    except Exception:
+        return {}
+
+
+def _get_parameters(func):
+    """
+    :return: [(name, default, annotation)] of the parameters which can be
+    passed by keyword, default is _EMPTY for the required ones.
+    """
+    try:
+        from inspect import signature
+    except ImportError:
+        from inspect import getargspec, ismethod
+        spec = getargspec(func)
+        names = spec.args[1:] if ismethod(func) else spec.args
+        defaults = spec.defaults or ()
+        required_count = len(names) - len(defaults)
+        return [
+            (
+                name,
+                defaults[index - required_count]
+                if index >= required_count else _EMPTY,
+                None,
+            )
+            for index, name in enumerate(names)
+        ]
+    hints = _get_type_hints(func)
+    parameters = []
+    for parameter in signature(func).parameters.values():
+        if parameter.kind not in (
+                parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY
+        ):
+            continue
+        default = parameter.default
+        if default is parameter.empty:
+            default = _EMPTY
+        annotation = parameter.annotation
+        if annotation is parameter.empty:
+            annotation = None
+        parameters.append(
+            (parameter.name, default, hints.get(parameter.name, annotation))
+        )
+    return parameters
+
+
+def _unwrap(annotation):
+    """
+    :return: (annotation, is_sequence), Optional[X] is X and List[X] is
+    a sequence of X.
+    """
+    args = getattr(annotation, "__args__", None) or ()
+    origin = getattr(annotation, "__origin__", None)
+    if str(origin) == "typing.Union" or \
+            type(annotation).__name__ == "UnionType":
+        others = [arg for arg in args if arg is not type(None)]
+        if len(others) == 1:
+            return _unwrap(others[0])
+        return None, False
+    if annotation in _SEQUENCE_TYPES or origin in _SEQUENCE_TYPES:
+        return (args[0] if args else None), True
+    return annotation, False
+
+
+def _get_param_type(annotation):
+    if isinstance(annotation, types.ParamTypeFactory):
+        return annotation
+    try:
+        return ANNOTATION_TYPES.get(annotation)
+    except TypeError:
+        return None
+
+
+def _infer(func):
+    for name, default, annotation in _get_parameters(func):
+        if name.startswith("_"):
+            continue
+        if annotation is None and default not in (_EMPTY, None):
+            annotation = type(default)
+        annotation, is_sequence = _unwrap(annotation)
+        param_type = _get_param_type(annotation)
+        option_name = name.replace("_", "-")
+        if is_sequence:
+            nargs = "+" if default is _EMPTY else "*"
+            yield "argument", name, {"type": param_type, "nargs": nargs}
+        elif annotation is bool:
+            if default is True:
+                yield "option", option_name, {
+                    "type": types.BOOL, "default": True,
+                }
+            else:
+                yield "option", option_name, {"is_flag": True}
+        elif default is _EMPTY:
+            yield "argument", name, {"type": param_type}
+        else:
+            yield "option", option_name, {
+                "type": param_type, "default": default,
+            }
+
+
+def infer_params(func):
+    """
+    Infer arguments and options from the signature of func.
+    A parameter without default is an argument, one with default is an
+    option, bool ones are flags and sequence ones take many values.
+    Types come from annotations (see `ANNOTATION_TYPES`, an instance of
+    `ParamTypeFactory` is used as it is) or from the type of default.
+    :type func: callable or LazyFunc
+    :return: [(method, name, kwargs)] of `AParser.argument` and
+    `AParser.option` in order of the parameters
+    """
+    if isinstance(func, LazyFunc):
+        func = func.func
+    try:
+        calls = _cache.get(func)
+    except TypeError:
+        return list(_infer(func))
+    if calls is None:
+        calls = _cache[func] = tuple(_infer(func))
+    return list(calls)
@@ -0,0 +1,90 @@
+import sys
+
+
+def import_ref(ref):
+    """
+    Import the object referenced by "package.module:attr.attr".
+    """
+    module_name, _, attr_path = ref.partition(":")
+    if not module_name or not attr_path:
+        raise ValueError(
+            "reference `{ref}` should be like `module:function`".format(
+                ref=ref
+            )
+        )
+    # importlib is missing on python 2.6
+    __import__(module_name)
+    obj = sys.modules[module_name]
+    for attr in attr_path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _is_module_attr(module_name, name, func):
+    # python 2 has no qualified name telling if func is local
+    obj = getattr(sys.modules.get(module_name), name, None)
+    # or the `Cmd` of func which shortcuts bind the name to
+    return obj is func or getattr(obj, "func", None) is func
+
+
+def get_ref(func):
+    """
+    Return the "module:function" reference of a module level function.
+    :type func: callable or LazyFunc
+    :rtype: str
+    """
+    if isinstance(func, LazyFunc):
+        return func.ref
+    qualname = getattr(func, "__qualname__", None)
+    name = qualname or func.__name__
+    module_name = getattr(func, "__module__", None)
+    if module_name is None or "<" in name or \
+            qualname is None and not _is_module_attr(module_name, name, func):
+        raise ValueError(
+            "Can not make a reference of `{func}`, only module level "
+            "functions are supported".format(func=func)
+        )
+    return "{module}:{name}".format(module=module_name, name=name)
+
+
+class LazyFunc(object):
+    """
+    Function proxy which imports the referenced function on first call.
+    """
+    __slots__ = (
+        "ref",
+        "_func",
+    )
+
+    def __init__(self, ref):
+        """
+        :type ref: str
+        :param ref: reference like "package.module:function"
+        """
+        if ":" not in ref:
+            raise ValueError(
+                "reference `{ref}` should be like `module:function`".format(
+                    ref=ref
+                )
+            )
+        self.ref = ref
+        self._func = None
+
+    @property
+    def resolved(self):
+        return self._func is not None
+
+    @property
+    def func(self):
+        if self._func is None:
+            self._func = import_ref(self.ref)
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __reduce__(self):
+        return LazyFunc, (self.ref, )
+
+    def __repr__(self):
+        return "LazyFunc(%r)" % self.ref
@@ -0,0 +1,172 @@
+import csv
+import errno
+import json
+import os
+import sys
+from itertools import islice
+
+import six
+
+from cmdtree._compat import Mapping
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# rows of strings joined at once by "lines" format
+_BATCH_SIZE = 1024
+
+
+class ChunkedWriter(object):
+    """
+    Text file-like object which keeps what is written and writes it
+    encoded to a binary stream in chunks of at least chunk_size.
+    """
+    __slots__ = ("out", "encoding", "chunk_size", "_pending", "_size")
+
+    def __init__(self, out, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+        self.out = out
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self._pending = []
+        self._size = 0
+
+    def write(self, text):
+        self._pending.append(text)
+        self._size += len(text)
+        if self._size >= self.chunk_size:
+            self._write_pending()
+
+    def _write_pending(self):
+        data = "".join(self._pending)
+        self._pending = []
+        self._size = 0
+        if isinstance(data, six.text_type):
+            data = data.encode(self.encoding)
+        self.out.write(data)
+
+    def flush(self):
+        if self._pending:
+            self._write_pending()
+        self.out.flush()
+
+
+def _to_text(value, encoding):
+    if isinstance(value, six.text_type):
+        return value
+    if isinstance(value, bytes):
+        return value.decode(encoding, "replace")
+    return six.text_type(value)
+
+
+def _write_lines(rows, writer):
+    rows = iter(rows)
+    encoding = writer.encoding
+    count = 0
+    while True:
+        batch = list(islice(rows, _BATCH_SIZE))
+        if not batch:
+            return count
+        try:
+            text = "\n".join(batch)
+        except TypeError:
+            text = "\n".join(_to_text(row, encoding) for row in batch)
+        writer.write(text + "\n")
+        count += len(batch)
+
+
+def _write_jsonl(rows, writer):
+    encode = json.JSONEncoder(
+        ensure_ascii=False, separators=(",", ":"), default=str,
+    ).encode
+    write = writer.write
+    count = 0
+    for row in rows:
+        write(encode(row) + "\n")
+        count += 1
+    return count
+
+
+def _write_csv(rows, writer, dialect="excel"):
+    """
+    Rows are sequences of fields, or mappings whose keys of the first
+    one are written as header.
+    """
+    writerow = csv.writer(writer, dialect, lineterminator="\n").writerow
+    fields = None
+    count = 0
+    for row in rows:
+        if isinstance(row, Mapping):
+            if fields is None:
+                fields = list(row)
+                writerow(fields)
+            row = [row.get(field) for field in fields]
+        elif isinstance(row, (six.string_types, bytes)) or \
+                not hasattr(row, "__iter__"):
+            row = (row, )
+        writerow(row)
+        count += 1
+    return count
+
+
+def _write_tsv(rows, writer):
+    return _write_csv(rows, writer, dialect="excel-tab")
+
+
+# {name: func(rows, writer) -> number of rows written}
+FORMATS = {
+    "lines": _write_lines,
+    "jsonl": _write_jsonl,
+    "csv": _write_csv,
+    "tsv": _write_tsv,
+}
+
+
+def is_rows(result):
+    """
+    Return True if result is written row by row, which is any iterable
+    but strings and mappings.
+    """
+    return hasattr(result, "__iter__") and \
+        not isinstance(result, (six.string_types, bytes, Mapping))
+
+
+def _silence_stdout():
+    # the reader is gone, send what is left in buffers of stdout
+    # to devnull instead of failing again when they are flushed.
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+    except (AttributeError, ValueError, OSError):
+        pass
+
+
+def write_rows(rows, format="lines", out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write rows in format to out in large chunks.
+    If the reader of out is gone (like `| head`), rows stops being
+    consumed and no error is raised.
+    :param format: name in `FORMATS`
+    :param out: binary stream, defaults to the one of stdout
+    :return: number of rows written, None if the reader is gone
+    """
+    write = FORMATS[format]
+    to_stdout = out is None
+    if to_stdout:
+        sys.stdout.flush()
+        out = getattr(sys.stdout, "buffer", sys.stdout)
+        encoding = getattr(sys.stdout, "encoding", None) or "utf-8"
+    else:
+        encoding = "utf-8"
+    writer = ChunkedWriter(out, encoding, chunk_size)
+    try:
+        count = write(rows, writer)
+        writer.flush()
+    except IOError as e:
+        if e.errno != errno.EPIPE:
+            raise
+        close = getattr(rows, "close", None)
+        if close is not None:
+            close()
+        if to_stdout:
+            _silence_stdout()
+        return None
+    return count
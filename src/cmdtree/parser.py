@@ -1,10 +1,27 @@
-from argparse import ArgumentParser
+from argparse import (
+    SUPPRESS,
+    Action,
+    ArgumentError,
+    ArgumentTypeError,
+    ArgumentParser,
+    _HelpAction,
+    _SubParsersAction,
+    _VersionAction,
+)
+from functools import partial
+from gettext import gettext as _
 import sys
+import threading
 
 import six
 
-from cmdtree.exceptions import ArgumentParseError
-from cmdtree.registry import env
+from cmdtree._compat import ContextVar, isawaitable, perf_counter
+from cmdtree.exceptions import ArgumentParseError, MapError
+from cmdtree.lazy import LazyFunc, get_ref
+from cmdtree.paths import resolve_path
+from cmdtree.registry import current_env
+from cmdtree.resources import scope
+from cmdtree.streams import iter_args
 
 
 def _normalize_arg_name(arg_name):
@@ -25,72 +42,918 @@ def vars_(object=None):
     return filtered_vars
 
 
+_CO_VARKEYWORDS = 0x08
+
+
+def _get_params(func):
+    """
+    Read the parameters of func from its code, which is much cheaper
+    than `inspect.signature`.
+    :return: (names, required names) of the parameters which can be
+    passed by keyword, None if unknown, like func takes **kwargs or
+    it is a `LazyFunc` not imported yet.
+    """
+    if isinstance(func, LazyFunc):
+        if not func.resolved:
+            return None
+        func = func.func
+    skip = 0
+    if getattr(func, "__self__", None) is not None:
+        skip = 1
+    func = getattr(func, "__func__", func)
+    code = getattr(func, "__code__", None)
+    if code is None or code.co_flags & _CO_VARKEYWORDS:
+        return None
+    positional_count = code.co_argcount
+    positional_only = getattr(code, "co_posonlyargcount", 0)
+    count = positional_count + getattr(code, "co_kwonlyargcount", 0)
+    names = code.co_varnames[max(skip, positional_only):count]
+    defaults = func.__defaults__ or ()
+    required = set(
+        code.co_varnames[skip:positional_count - len(defaults)]
+    )
+    kw_defaults = getattr(func, "__kwdefaults__", None) or {}
+    for name in code.co_varnames[positional_count:count]:
+        if name not in kw_defaults:
+            required.add(name)
+    return frozenset(names), frozenset(required)
+
+
+def _check_argument_name(name):
+    if name.startswith("-"):
+        raise ValueError(
+            "positional argument [{0}] can not contains `-` in".format(name)
+        )
+
+
+def _mk_choice_action(subparsers, name, help):
+    """
+    Create the pseudo action which shows a sub-command in help message.
+    """
+    if six.PY2:
+        return subparsers._ChoicesPseudoAction(name, help)
+    return subparsers._ChoicesPseudoAction(name, (), help)
+
+
+_HELP_FLAGS = ("-h", "--help")
+
+# {name: value of sub-command parser}, settings of a parser which change
+# how the args of its sub-commands are parsed, like "@args.txt".
+_PARSE_SETTINGS = {
+    "prefix_chars": "-",
+    "fromfile_prefix_chars": None,
+    "allow_abbrev": True,
+}
+
+
+def _is_param_action(action):
+    """
+    Return True if the value of action is passed to the command function.
+    """
+    dest = action.dest
+    return not (
+        dest is SUPPRESS or
+        dest.startswith("_") or
+        isinstance(action, (_HelpAction, _VersionAction))
+    )
+
+# held while lazy parts of a tree are built, like materializing a
+# `LazyAParser` or expanding a `CmdNode`, reentrant since building a
+# parser builds its parents.
+build_lock = threading.RLock()
+
+
+# `Result` of the running `invoke`, parsers write their messages to it
+# instead of stdio and raise instead of exiting.
+_capture = ContextVar("cmdtree_capture", default=None)
+
+
+class _CapturedExit(Exception):
+
+    def __init__(self, status, message=None):
+        super(_CapturedExit, self).__init__(message)
+        self.status = status
+
+
+def _set_token(token):
+    result = _capture.get()
+    if result is not None and result.token is None:
+        result.token = token
+
+
+def _exit(status=0, message=None):
+    if current_env().silent_exit:
+        sys.exit(status)
+    raise ArgumentParseError(message)
+
+
+class _LazyParserMap(dict):
+    """
+    Name to parser map of sub-commands, `LazyAParser` placeholders
+    are materialized on the first lookup.
+    """
+
+    def __getitem__(self, name):
+        parser = dict.__getitem__(self, name)
+        if isinstance(parser, LazyAParser):
+            parser = parser.materialize()
+            dict.__setitem__(self, name, parser)
+        return parser
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+def _call_mapped(func, kwargs, dest, value):
+    kwargs = dict(kwargs)
+    kwargs[dest] = value
+    return func(**kwargs)
+
+
+# value of a `argfile` argument starts with it is a file of values,
+# "@@value" is the literal "@value"
+ARGFILE_PREFIX = "@"
+
+
+def _iter_argfile_values(parser, action, values):
+    for value in values:
+        if value.startswith(ARGFILE_PREFIX) and len(value) > 1:
+            value = value[1:]
+            if not value.startswith(ARGFILE_PREFIX):
+                for item in iter_args(resolve_path(value)):
+                    yield action.convert_value(parser, item)
+                continue
+        yield action.convert_value(parser, value)
+
+
+class _ArgfileAction(Action):
+    """
+    Store a generator of the values, in which a "@file" value is
+    replaced by the lines of file (stdin for "@-") read as they are
+    pulled, and the type converter is applied to each of them.
+    """
+
+    def __init__(self, option_strings, dest, convert=None, **kwargs):
+        super(_ArgfileAction, self).__init__(option_strings, dest, **kwargs)
+        self.convert = convert
+
+    def convert_value(self, parser, value):
+        if self.convert is None:
+            return value
+        try:
+            return self.convert(value)
+        except ArgumentTypeError as e:
+            message = str(e)
+        except (TypeError, ValueError):
+            message = _('invalid value: %r') % value
+        _set_token(value)
+        parser.error(str(ArgumentError(self, message)))
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        for value in values:
+            if not value.startswith(ARGFILE_PREFIX):
+                continue
+            filename = value[1:]
+            if filename in ("", "-") or filename.startswith(ARGFILE_PREFIX):
+                continue
+            # fail at parsing instead of in the middle of command
+            try:
+                open(filename, "rb").close()
+            except (IOError, OSError) as e:
+                _set_token(value)
+                parser.error(str(ArgumentError(
+                    self, _("can't open '%s': %s") % (filename, e)
+                )))
+        setattr(
+            namespace,
+            self.dest,
+            _iter_argfile_values(parser, self, values),
+        )
+
+
+def _get_picklable(func):
+    """
+    Reference of func to send to processes, pickle can not find a
+    function whose name is rebound to a `Cmd` by the shortcuts, but
+    importing the reference gets the `Cmd`, which calls the function.
+    """
+    if isinstance(func, LazyFunc):
+        return func
+    try:
+        return LazyFunc(get_ref(func))
+    except ValueError:
+        return func
+
+
+class MappedCall(object):
+    """
+    Call the command once for each value of its mappable argument,
+    in a process pool if jobs is bigger than 1.
+    """
+
+    def __init__(self, func, dest, jobs=1):
+        self.func = func
+        self.dest = dest
+        self.jobs = jobs
+
+    def __call__(self, **kwargs):
+        """
+        :return: results in order of the values
+        :raise MapError: if any of the calls failed
+        """
+        values = kwargs.pop(self.dest)
+        results = []
+        failures = []
+        if self.jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            # values of argfile argument is a generator
+            values = list(values)
+            func = _get_picklable(self.func)
+            with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                futures = [
+                    executor.submit(
+                        _call_mapped, func, kwargs, self.dest, value
+                    )
+                    for value in values
+                ]
+                for value, future in zip(values, futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        results.append(None)
+                        failures.append((value, e))
+        else:
+            for value in values:
+                try:
+                    results.append(
+                        _call_mapped(self.func, kwargs, self.dest, value)
+                    )
+                except Exception as e:
+                    results.append(None)
+                    failures.append((value, e))
+        if failures:
+            raise MapError(results, failures)
+        return results
+
+
+class OutputCall(object):
+    """
+    Call the command and write its result to stdout in format if it is
+    iterable, see `cmdtree.output.write_rows`.
+    """
+
+    def __init__(self, func, format):
+        self.func = func
+        self.format = format
+
+    def write(self, result):
+        from cmdtree.output import is_rows, write_rows
+        if not is_rows(result):
+            return result
+        write_rows(result, self.format)
+        return None
+
+    def __call__(self, **kwargs):
+        result = self.func(**kwargs)
+        if isawaitable(result):
+            from cmdtree.aio import then
+            return then(result, self.write)
+        return self.write(result)
+
+
+def _exit_status(error):
+    if isinstance(error, SystemExit):
+        if error.code is None:
+            return 0
+        if isinstance(error.code, int):
+            return error.code
+        return 1
+    if isinstance(error, ArgumentParseError):
+        return 2
+    return 1
+
+
+def call_for_status(run, args):
+    """
+    Call `run(args)` and turn parser exits and errors into exit status.
+    :return: (status, result), result is the exception if status is not 0
+    """
+    try:
+        return 0, run(args)
+    except SystemExit as e:
+        if e.code is None:
+            return 0, None
+        return _exit_status(e), e
+    except Exception as e:
+        return _exit_status(e), e
+
+
+class Result(object):
+    """
+    Outcome of `invoke`.
+    status: exit status, 0 for success, 2 for parse errors, 1 for others
+    value: return value of the command
+    error: exception raised by parsing or by the command
+    token: the argument which failed to parse, if known
+    output: messages the parsers would print, like help and usage
+    timings: {"resolve", "parse", "run": seconds}
+    """
+    __slots__ = (
+        "status",
+        "value",
+        "error",
+        "token",
+        "_output",
+        "timings",
+    )
+
+    def __init__(self, timings=None):
+        self.status = 0
+        self.value = None
+        self.error = None
+        self.token = None
+        self._output = []
+        self.timings = timings or {}
+
+    @property
+    def ok(self):
+        return self.status == 0
+
+    @property
+    def output(self):
+        return "".join(self._output)
+
+    def __repr__(self):
+        return "Result(status=%r, value=%r, error=%r)" % (
+            self.status, self.value, self.error,
+        )
+
+
+def _invoke(parser, args, namespace, result):
+    start = perf_counter()
+    if args and args[0] in _HELP_FLAGS:
+        # saved or cached help, no parser is built for it
+        result._output.append(parser.format_help())
+        return
+    try:
+        func, kwargs = parser.parse_cmd(args, namespace)
+    finally:
+        parsed = perf_counter()
+        result.timings['parse'] = parsed - start
+    try:
+        value = func(**kwargs)
+        if isawaitable(value):
+            from cmdtree.aio import run_sync
+            value = run_sync(value)
+        result.value = value
+    finally:
+        result.timings['run'] = perf_counter() - parsed
+
+
+def invoke(parser, args=None, namespace=None, timings=None):
+    """
+    Run the command selected by args without printing or exiting,
+    parse errors, exits and exceptions of the command are returned.
+    :type parser: AParser or LazyAParser
+    :rtype: Result
+    """
+    result = Result(timings)
+    token = _capture.set(result)
+    try:
+        with scope():
+            _invoke(parser, args, namespace, result)
+    except _CapturedExit as e:
+        result.status = e.status
+        if e.status != 0:
+            result.error = e
+    except SystemExit as e:
+        result.status = _exit_status(e)
+        if e.code is not None:
+            result.error = e
+    except Exception as e:
+        result.status = _exit_status(e)
+        result.error = e
+    finally:
+        _capture.reset(token)
+    return result
+
+
 class AParser(ArgumentParser):
     """
     Arg-parse wrapper for sub command and convenient arg parse.
     """
     def __init__(self, *args, **kwargs):
         self.subparsers = None
+        # argument and option calls, kept for tree snapshot
+        self.calls = []
+        # {"help" or "usage": (key, text)}, see `_help_key`
+        self._help_cache = {}
+        # parser of parent command, None for root
+        self._parent = None
+        # (key, {dest: param}) and (key, ((dest, param), ...)),
+        # see `_get_param_map` and `get_kwargs_map`
+        self._param_map = None
+        self._kwargs_map = None
+        self._chain = None
+        # default format of `add_output_option`, None if not added
+        self.output_format = None
+        self._output_action = None
         super(AParser, self).__init__(*args, **kwargs)
+        # the deepest parser of a command path is in the namespace
+        self.set_defaults(_parser=self)
+
+    def _get_subparsers(self, help=None):
+        if self.subparsers is None:
+            self.subparsers = self.add_subparsers(
+                title="sub-commands",
+                help=help or 'sub-commands',
+            )
+            self.subparsers._name_parser_map = _LazyParserMap()
+            self.subparsers.choices = self.subparsers._name_parser_map
+        return self.subparsers
 
-    def add_cmd(self, name, help=None, func=None):
+    def add_cmd(self, name, help=None, func=None, lazy=False):
         """
         If func is None, this is regarded as a sub-parser which can contains
         sub-command.
         Else, this is a leaf node in cmd tree which can not add sub-command.
-        :rtype: AParser
+        If lazy is True, a `LazyAParser` is returned and the real parser
+        will not be built until it is used.
+        :rtype: AParser or LazyAParser
         """
-        if self.subparsers is None:
-            self.subparsers = self.add_subparsers(
-                title="sub-commands",
-                help=help or 'sub-commands',
+        if lazy:
+            lazy_parser = LazyAParser(
+                partial(self._build_cmd, name, func),
+                name=name,
+                help=help,
+                func=func,
             )
+            self._attach_cmd(lazy_parser)
+            return lazy_parser
 
-        parser = self.subparsers.add_parser(
+        subparsers = self._get_subparsers(help)
+        parser = subparsers.add_parser(
             name,
             help=help,
         )
+        parser._parent = self
         if func is not None:
             parser.set_defaults(_func=func)
         return parser
 
-    def run(self, args=None, namespace=None):
+    def _attach_cmd(self, lazy_parser):
+        """
+        Register a `LazyAParser` as sub-command without building it.
+        :type lazy_parser: LazyAParser
+        """
+        name = lazy_parser.name
+        subparsers = self._get_subparsers(lazy_parser.help)
+        if name in subparsers.choices:
+            raise ArgumentError(
+                subparsers, 'conflicting subparser: %s' % name
+            )
+        subparsers._choices_actions.append(
+            _mk_choice_action(subparsers, name, lazy_parser.help)
+        )
+        subparsers.choices[name] = lazy_parser
+
+    def _build_cmd(self, name, func=None):
+        """
+        Build the real parser of a sub-command registered by `_attach_cmd`.
+        :rtype: AParser
+        """
+        subparsers = self._get_subparsers()
+        parser = subparsers._parser_class(
+            prog='%s %s' % (subparsers._prog_prefix, name),
+        )
+        parser._parent = self
+        if func is not None:
+            parser.set_defaults(_func=func)
+        return parser
+
+    def has_arguments(self):
+        """
+        Return True if the parser has any argument, option or default
+        value except help and sub-commands, or parses differently from
+        its sub-commands, which means it can not be skipped when the
+        command path is resolved without parsing.
+        """
+        for name, value in _PARSE_SETTINGS.items():
+            if getattr(self, name, value) != value:
+                return True
+        for action in self._actions:
+            if isinstance(action, (_HelpAction, _SubParsersAction)):
+                continue
+            # global options like `--output` are parsed by any parser
+            if action.option_strings and action.dest.startswith("_"):
+                continue
+            return True
+        for key in self._defaults:
+            if key not in ("_func", "_parser"):
+                return True
+        return False
+
+    def add_argument(self, *args, **kwargs):
+        action = super(AParser, self).add_argument(*args, **kwargs)
+        if _is_param_action(action):
+            params = _get_params(self._defaults.get("_func"))
+            param = _normalize_arg_name(action.dest)
+            if params is not None and param not in params[0]:
+                raise ValueError(
+                    "Function of command `{prog}` has no parameter "
+                    "`{param}`".format(prog=self.prog, param=param)
+                )
+        return action
+
+    def _get_param_map(self):
+        """
+        {dest: param} of the values this parser puts in namespace.
+        """
+        key = (len(self._actions), len(self._defaults))
+        if self._param_map is None or self._param_map[0] != key:
+            param_map = {}
+            for action in self._actions:
+                if _is_param_action(action):
+                    param_map[action.dest] = _normalize_arg_name(action.dest)
+            for dest in self._defaults:
+                if not dest.startswith("_"):
+                    param_map[dest] = _normalize_arg_name(dest)
+            self._param_map = (key, param_map)
+        return self._param_map[1]
+
+    def _get_chain(self):
+        """
+        Parsers from this one to root.
+        """
+        if self._chain is None:
+            chain = []
+            parser = self
+            while parser is not None:
+                chain.append(parser)
+                parser = parser._parent
+            self._chain = tuple(chain)
+        return self._chain
+
+    def get_kwargs_map(self):
+        """
+        Return ((dest, param), ...) of the parsers from root to this one,
+        which turns the namespace parsed for this command to keyword
+        arguments of its function. It is built once and checked against
+        the parameters of the function.
+        :raise ValueError: if they do not match the function
+        """
+        chain = self._get_chain()
+        # actions and defaults are only added, so the sum changes with them
+        key = sum(len(p._actions) + len(p._defaults) for p in chain)
+        if self._kwargs_map is not None and self._kwargs_map[0] == key:
+            return self._kwargs_map[1]
+        param_map = {}
+        for parser in reversed(chain):
+            param_map.update(parser._get_param_map())
+        params = _get_params(self._defaults.get("_func"))
+        if params is not None:
+            names, required = params
+            given = set(param_map.values())
+            unknown = given - names
+            missing = required - given
+            if unknown or missing:
+                raise ValueError(
+                    "Arguments of command `{prog}` do not match its "
+                    "function, unknown: {unknown}, missing: {missing}".format(
+                        prog=self.prog,
+                        unknown=sorted(unknown),
+                        missing=sorted(missing),
+                    )
+                )
+        kwargs_map = tuple(param_map.items())
+        self._kwargs_map = (key, kwargs_map)
+        return kwargs_map
+
+    def _kwargs_of(self, namespace):
+        values = namespace.__dict__
+        return dict(
+            (param, values[dest])
+            for dest, param in self.get_kwargs_map()
+            if dest in values
+        )
+
+    def parse_cmd(self, args=None, namespace=None):
+        """
+        :return: (func, kwargs) of the command selected by args
+        """
         args = self.parse_args(args, namespace)
         _func = getattr(args, "_func", None)
 
-        if _func:
-            return args._func(**vars_(args))
-        else:
+        if not _func:
             raise ValueError(
                 "No function binding for args `{args}`".format(
                     args=args
                 )
             )
+        parser = getattr(args, "_parser", None)
+        if namespace is None and parser is not None:
+            kwargs = parser._kwargs_of(args)
+        else:
+            # attributes of the given namespace are passed as well
+            kwargs = vars_(args)
+        _map = getattr(args, "_map", None)
+        if _map is not None:
+            _func = MappedCall(_func, _map, jobs=args._jobs)
+        output_format = getattr(args, "_output", None) or \
+            (parser or self)._get_output_format()
+        # results of `invoke` are returned as they are
+        if output_format is not None and _capture.get() is None:
+            _func = OutputCall(_func, output_format)
+        return _func, kwargs
+
+    def add_output_option(self, default="lines"):
+        """
+        Add the global `--output` option to this parser and all of its
+        sub-commands, iterable results of commands are written to stdout
+        in the chosen format (see `cmdtree.output.FORMATS`) instead of
+        being returned.
+        """
+        self.output_format = default
+        self._output_action = None
+        self._ensure_output_option()
+
+    def _get_output_format(self):
+        for parser in self._get_chain():
+            if parser.output_format is not None:
+                return parser.output_format
+        return None
+
+    def _ensure_output_option(self):
+        # sub-commands get the option when they are first used, so it
+        # works for the ones added before `add_output_option`.
+        if self._output_action is not None:
+            return
+        output_format = self._get_output_format()
+        if output_format is None:
+            return
+        from cmdtree.output import FORMATS
+        with build_lock:
+            if self._output_action is None:
+                self._output_action = self.add_argument(
+                    "--output",
+                    dest="_output",
+                    choices=sorted(FORMATS),
+                    # keep the value given to parent parsers
+                    default=SUPPRESS,
+                    help="format of results, default: {0}".format(
+                        output_format
+                    ),
+                )
+
+    def run(self, args=None, namespace=None):
+        """
+        Run the command selected by args, coroutine commands are
+        waited on the loop shared by all of the dispatches.
+        Resources opened for args (see `cmdtree.resources`) are closed
+        when the command returns.
+        """
+        with scope():
+            func, kwargs = self.parse_cmd(args, namespace)
+            try:
+                result = func(**kwargs)
+            except MapError as e:
+                self._print_message(e.summary(), sys.stderr)
+                if current_env().silent_exit:
+                    sys.exit(1)
+                raise
+            if isawaitable(result):
+                from cmdtree.aio import run_sync
+                result = run_sync(result)
+            return result
+
+    def run_async(self, args=None, namespace=None):
+        """
+        Return a coroutine which runs the command selected by args
+        and awaits it if it is a coroutine.
+        """
+        from cmdtree.aio import run_async
+        return run_async(self, args, namespace)
+
+    def run_many(self, args_list):
+        """
+        Run every args in args_list, a failed one does not stop the rest.
+        :type args_list: iterable
+        :return: generator of (status, result) in order of args_list
+        """
+        for args in args_list:
+            yield call_for_status(self.run, args)
 
     def exit(self, status=0, message=None):
+        if _capture.get() is not None:
+            raise _CapturedExit(status, message)
         if message:
             self._print_message(message, sys.stderr)
-        if env.silent_exit:
-            sys.exit(status)
-        else:
+        _exit(status, message)
+
+    def error(self, message):
+        if _capture.get() is not None:
             raise ArgumentParseError(message)
+        super(AParser, self).error(message)
+
+    def _print_message(self, message, file=None):
+        result = _capture.get()
+        if result is None:
+            return super(AParser, self)._print_message(message, file)
+        if message:
+            result._output.append(message)
+
+    def parse_known_args(self, args=None, namespace=None):
+        self._ensure_output_option()
+        return super(AParser, self).parse_known_args(args, namespace)
+
+    def parse_args(self, args=None, namespace=None):
+        args, argv = self.parse_known_args(args, namespace)
+        if argv:
+            _set_token(argv[0])
+            self.error(_('unrecognized arguments: %s') % ' '.join(argv))
+        return args
+
+    def _get_value(self, action, arg_string):
+        try:
+            return super(AParser, self)._get_value(action, arg_string)
+        except ArgumentError:
+            _set_token(arg_string)
+            raise
+
+    def _check_value(self, action, value):
+        try:
+            return super(AParser, self)._check_value(action, value)
+        except ArgumentError:
+            _set_token(value)
+            raise
+
+    def _help_key(self):
+        """
+        Rendered help is out of date once an argument or a sub-command
+        is added, which changes the key.
+        """
+        subparsers = self.subparsers
+        return (
+            len(self._actions),
+            0 if subparsers is None else len(subparsers._choices_actions),
+        )
 
-    def argument(self, name, help=None, type=None):
+    def _get_cached(self, name, render):
+        key = self._help_key()
+        cached = self._help_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        text = render()
+        self._help_cache[name] = (key, text)
+        return text
+
+    def format_usage(self):
+        self._ensure_output_option()
+        return self._get_cached(
+            "usage", super(AParser, self).format_usage
+        )
+
+    def format_help(self):
+        self._ensure_output_option()
+        return self._get_cached(
+            "help", super(AParser, self).format_help
+        )
+
+    def iter_help(self):
+        """
+        Yield the help message in chunks, entries of sub-commands are
+        rendered one by one as they are consumed, so a group with many
+        sub-commands starts printing at once.
+        """
+        self._ensure_output_option()
+        key = self._help_key()
+        cached = self._help_cache.get("help")
+        subparsers = self.subparsers
+        if cached is not None and cached[0] == key or \
+                subparsers is None or not subparsers._choices_actions:
+            yield self.format_help()
+            return
+        choices_actions = subparsers._choices_actions
+        # a placeholder entry as wide as the widest sub-command keeps
+        # the columns of the rest of the message unchanged.
+        marker = "\0" * max(
+            len(action.metavar or action.dest) for action in choices_actions
+        )
+        subparsers._choices_actions = [
+            _mk_choice_action(subparsers, marker, None)
+        ]
+        try:
+            text = super(AParser, self).format_help()
+            formatter = self._get_formatter()
+            formatter._indent()
+            formatter.add_arguments(self._actions)
+            formatter._indent()
+        finally:
+            subparsers._choices_actions = choices_actions
+        marker_index = text.index(marker)
+        head = text[:text.rfind("\n", 0, marker_index) + 1]
+        tail = text[text.index("\n", marker_index) + 1:]
+        chunks = [head]
+        yield head
+        for action in choices_actions:
+            chunk = formatter._format_action(action)
+            chunks.append(chunk)
+            yield chunk
+        chunks.append(tail)
+        yield tail
+        self._help_cache["help"] = (key, "".join(chunks))
+
+    def print_help(self, file=None):
+        if file is None:
+            file = sys.stdout
+        for chunk in self.iter_help():
+            self._print_message(chunk, file)
+
+    def argument(self, name, help=None, type=None, nargs=None, map=False,
+                 argfile=False):
+        """
+        :param map: if True, the argument is mappable, the command will be
+        called once for each of its values (in processes if `--jobs N`
+        is given) and return the list of results.
+        :param argfile: if True, a value like "@ids.txt" stands for the
+        lines of file ("@-" for stdin), the command gets a generator
+        which reads the files and converts the values as it is pulled.
+        """
         kwargs = {"help": help}
-        if name.startswith("-"):
+        _check_argument_name(name)
+        if map and nargs not in ("+", "*"):
+            raise ValueError(
+                "mappable argument [{0}] should have nargs `+` or `*`".format(
+                    name
+                )
+            )
+        if argfile and nargs not in ("+", "*"):
             raise ValueError(
-                "positional argument [{0}] can not contains `-` in".format(name)
+                "argfile argument [{0}] should have nargs `+` or `*`".format(
+                    name
+                )
             )
+        self.calls.append(
+            (
+                "argument",
+                (name, ),
+                {
+                    "help": help,
+                    "type": type,
+                    "nargs": nargs,
+                    "map": map,
+                    "argfile": argfile,
+                },
+            )
+        )
 
         if type is not None:
             kwargs.update(
                 type()
             )
-        return self.add_argument(
+        if argfile:
+            # values are converted and checked when they are pulled
+            kwargs.pop("choices", None)
+            kwargs['convert'] = kwargs.pop("type", None)
+            kwargs['action'] = _ArgfileAction
+        if nargs is not None:
+            kwargs['nargs'] = nargs
+        action = self.add_argument(
             name, **kwargs
         )
+        if map:
+            self.set_defaults(_map=_normalize_arg_name(name))
+            self.add_argument(
+                "--jobs",
+                dest="_jobs",
+                type=int,
+                default=1,
+                help="number of processes to run the command "
+                     "over values of {0}".format(name),
+            )
+        return action
 
     def option(self, name, help=None, is_flag=False, default=None, type=None):
+        self.calls.append(
+            (
+                "option",
+                (name, ),
+                {
+                    "help": help,
+                    "is_flag": is_flag,
+                    "default": default,
+                    "type": type,
+                },
+            )
+        )
         _name = name
         if not name.startswith("-"):
             _name = "--" + name
@@ -101,4 +964,137 @@ class AParser(ArgumentParser):
             kwargs['default'] = default
         if type is not None:
             kwargs.update(type())
-        return self.add_argument(_name, **kwargs)
\ No newline at end of file
+        return self.add_argument(_name, **kwargs)
+
+
+class LazyAParser(object):
+    """
+    Placeholder of a sub-command parser.
+    It records the calls which build the parser and replays them on
+    a real `AParser` the first time the parser is needed, so a tree
+    only pays for the parsers on the path it dispatches.
+    """
+    def __init__(self, factory, name=None, help=None, func=None):
+        """
+        :type factory: callable
+        :param factory: return the real parser without any argument.
+        """
+        self._factory = factory
+        self._parser = None
+        self.name = name
+        self.help = help
+        self.func = func
+        self.calls = []
+        self.children = []
+        # callables run before the parser is built, which may still
+        # record calls and add sub-commands.
+        self.hooks = []
+        # help message of the parser rendered before, like the one
+        # saved in tree snapshot, reset when the parser is changed.
+        self.rendered_help = None
+
+    @property
+    def materialized(self):
+        return self._parser is not None
+
+    def materialize(self):
+        """
+        :rtype: AParser
+        """
+        if self._parser is None:
+            with build_lock:
+                if self._parser is None:
+                    self._build()
+        return self._parser
+
+    def _build(self):
+        hooks, self.hooks = self.hooks, []
+        for hook in hooks:
+            hook()
+        parser = self._factory()
+        for method, args, kwargs in self.calls:
+            getattr(parser, method)(*args, **kwargs)
+        for child in self.children:
+            parser._attach_cmd(child)
+        self._parser = parser
+
+    def _record(self, method, args, kwargs):
+        self.rendered_help = None
+        self.calls.append((method, args, kwargs))
+        if self._parser is not None:
+            return getattr(self._parser, method)(*args, **kwargs)
+
+    def argument(self, name, *args, **kwargs):
+        _check_argument_name(name)
+        return self._record("argument", (name, ) + args, kwargs)
+
+    def option(self, *args, **kwargs):
+        return self._record("option", args, kwargs)
+
+    def add_argument(self, *args, **kwargs):
+        return self._record("add_argument", args, kwargs)
+
+    def set_defaults(self, **kwargs):
+        return self._record("set_defaults", (), kwargs)
+
+    def has_arguments(self):
+        if self._parser is not None:
+            return self._parser.has_arguments()
+        return len(self.calls) > 0
+
+    def add_cmd(self, name, help=None, func=None, lazy=True):
+        """
+        Sub-commands of a lazy parser are always lazy.
+        :rtype: LazyAParser
+        """
+        if self._parser is not None:
+            return self._parser.add_cmd(
+                name, help=help, func=func, lazy=True
+            )
+        self.rendered_help = None
+        child = LazyAParser(
+            partial(self._build_child, name, func),
+            name=name,
+            help=help,
+            func=func,
+        )
+        self.children.append(child)
+        return child
+
+    def _use_rendered_help(self):
+        return self._parser is None and self.rendered_help is not None
+
+    def format_help(self):
+        if self._use_rendered_help():
+            return self.rendered_help
+        return self.materialize().format_help()
+
+    def iter_help(self):
+        if self._use_rendered_help():
+            return iter((self.rendered_help, ))
+        return self.materialize().iter_help()
+
+    def print_help(self, file=None):
+        if self._use_rendered_help():
+            file = sys.stdout if file is None else file
+            file.write(self.rendered_help)
+            return
+        return self.materialize().print_help(file)
+
+    def run(self, args=None, namespace=None):
+        """
+        Same as `AParser.run`, but a leading help flag is answered with
+        the rendered help without building any parser.
+        """
+        if args and args[0] in _HELP_FLAGS and self._use_rendered_help():
+            self.print_help()
+            return _exit(0)
+        return self.materialize().run(args, namespace)
+
+    def _build_child(self, name, func):
+        return self.materialize()._build_cmd(name, func)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
@@ -0,0 +1,252 @@
+import fnmatch
+import os
+import re
+import stat
+from contextlib import contextmanager
+
+from cmdtree._compat import ContextVar
+
+# characters which make a path a glob pattern
+_MAGIC = re.compile(r"[*?[]")
+
+
+# directory which relative paths of arguments are resolved against,
+# like cwd of the client served by `cmdtree.server`, see `base_dir`
+_base_dir = ContextVar("cmdtree_base_dir", default=None)
+
+
+def has_magic(path):
+    return _MAGIC.search(path) is not None
+
+
+@contextmanager
+def base_dir(path):
+    """
+    Resolve relative paths of arguments parsed in the block against path
+    instead of cwd of the process, which is shared by the threads.
+    """
+    token = _base_dir.set(path)
+    try:
+        yield
+    finally:
+        _base_dir.reset(token)
+
+
+def resolve_path(path):
+    """
+    Return path joined to the base directory of current block, path is
+    returned as it is if it is absolute, "-" for stdio, or there is no
+    base directory.
+    """
+    base = _base_dir.get()
+    if base is None or path == "-" or os.path.isabs(path):
+        return path
+    return os.path.join(base, path)
+
+
+class PathEntry(object):
+    """
+    `os.DirEntry` like entry of a path given as it is, its stat results
+    are cached like the ones of `os.DirEntry`.
+    """
+    __slots__ = ("path", "name", "_stat", "_lstat")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path.rstrip(os.sep)) or path
+        self._stat = None
+        self._lstat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def _test_mode(self, test, follow_symlinks=True):
+        try:
+            return test(self.stat(follow_symlinks).st_mode)
+        except OSError:
+            return False
+
+    def is_dir(self, follow_symlinks=True):
+        return self._test_mode(stat.S_ISDIR, follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self._test_mode(stat.S_ISREG, follow_symlinks)
+
+    def is_symlink(self):
+        return self._test_mode(stat.S_ISLNK, follow_symlinks=False)
+
+    def inode(self):
+        return self.stat(follow_symlinks=False).st_ino
+
+    def __fspath__(self):
+        return self.path
+
+    def __repr__(self):
+        return "<PathEntry %r>" % (self.path, )
+
+
+def _scandir(path):
+    scandir = getattr(os, "scandir", None)
+    if scandir is not None:
+        return scandir(path)
+    return iter([
+        PathEntry(os.path.join(path, name)) for name in os.listdir(path)
+    ])
+
+
+def _close(iterator):
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+def _match_parts(parts, names):
+    if not parts:
+        return not names
+    part = parts[0]
+    if part is None:
+        return any(
+            _match_parts(parts[1:], names[index:])
+            for index in range(len(names) + 1)
+        )
+    return bool(names) and part(names[0]) is not None and \
+        _match_parts(parts[1:], names[1:])
+
+
+class PathPattern(object):
+    """
+    Glob pattern relative to a directory with "/" between components,
+    matched component by component, "**" matches any number of
+    directories.
+    """
+    __slots__ = ("parts", "fixed")
+
+    def __init__(self, pattern):
+        names = [name for name in pattern.split("/") if name]
+        # None for "**"
+        self.parts = tuple(
+            None if name == "**" else re.compile(fnmatch.translate(name)).match
+            for name in names
+        )
+        # number of parts before the first "**"
+        self.fixed = self.parts.index(None) \
+            if None in self.parts else len(self.parts)
+
+    def match(self, names):
+        return _match_parts(self.parts, names)
+
+    def can_contain(self, names):
+        """
+        Return True if the directory of names may have matched paths.
+        """
+        if self.fixed == len(self.parts) and len(names) >= self.fixed:
+            return False
+        return all(
+            part(name) is not None
+            for part, name in zip(self.parts[:self.fixed], names)
+        )
+
+
+def _compile_names(patterns):
+    return tuple(
+        re.compile(fnmatch.translate(pattern)).match
+        for pattern in patterns or ()
+    )
+
+
+def split_pattern(pattern):
+    """
+    :return: (base directory, pattern relative to it), base is the
+    leading components of pattern without magic characters.
+    """
+    base = []
+    rest = pattern.replace(os.sep, "/").split("/")
+    while len(rest) > 1 and not has_magic(rest[0]):
+        base.append(rest.pop(0))
+    if not base:
+        return os.curdir, "/".join(rest)
+    # "/" of absolute path is an empty first component
+    return "/".join(base) or "/", "/".join(rest)
+
+
+def iter_paths(path, recursive=False, include=None, exclude=None,
+               kind=None, follow_symlinks=False):
+    """
+    Lazily walk path with `os.scandir` and yield the entries (of
+    `os.DirEntry` or `PathEntry`) whose cached stat results can be used
+    instead of calling `os.stat` again.
+    Only the directories on the path being walked are open, so memory
+    used does not grow with the number of entries.
+    :param path: directory, file or glob pattern like "logs/**/*.gz"
+    :param recursive: walk sub-directories of a directory
+    :param include: glob patterns of names, yield only the entries whose
+    name matches any of them
+    :param exclude: glob patterns of names of entries neither yielded
+    nor walked into
+    :param kind: "file" or "dir" to only yield files or directories
+    :param follow_symlinks: walk into symbolic links to directories
+    """
+    include = _compile_names(include)
+    exclude = _compile_names(exclude)
+
+    def accept_entry(entry):
+        if include and not any(match(entry.name) for match in include):
+            return False
+        if kind == "file":
+            return entry.is_file(follow_symlinks=follow_symlinks)
+        if kind == "dir":
+            return entry.is_dir(follow_symlinks=follow_symlinks)
+        return True
+
+    accept = accept_entry if include or kind is not None else None
+    if has_magic(path):
+        base, pattern = split_pattern(path)
+        pattern = PathPattern(pattern)
+    elif os.path.isdir(path):
+        base, pattern = path, None
+    else:
+        entry = PathEntry(path)
+        if accept is None or accept(entry):
+            yield entry
+        return
+
+    try:
+        stack = [(_scandir(base), ())]
+    except OSError:
+        # base directory of pattern does not exist
+        return
+    try:
+        while stack:
+            iterator, parent_names = stack[-1]
+            entry = next(iterator, None)
+            if entry is None:
+                stack.pop()
+                _close(iterator)
+                continue
+            if exclude and any(match(entry.name) for match in exclude):
+                continue
+            if pattern is None:
+                names = ()
+                walk = recursive
+                matched = True
+            else:
+                names = parent_names + (entry.name, )
+                walk = pattern.can_contain(names)
+                matched = pattern.match(names)
+            if matched and (accept is None or accept(entry)):
+                yield entry
+            if walk and entry.is_dir(follow_symlinks=follow_symlinks):
+                try:
+                    stack.append((_scandir(entry.path), names))
+                except OSError:
+                    # like permission denied, skip the directory
+                    continue
+    finally:
+        for iterator, _ in stack:
+            _close(iterator)
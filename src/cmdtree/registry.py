@@ -1,19 +1,164 @@
+import shlex
+import sys
+from contextlib import contextmanager
+
+import six
+
+from cmdtree._compat import ContextVar, _get_argv_encoding
+
+# env of the running dispatch, see `current_env`
+_active_env = ContextVar("cmdtree_env", default=None)
+# {env: {setting: value}} overridden by `ENV.settings`
+_overrides = ContextVar("cmdtree_settings", default={})
+
+
+def current_env():
+    """
+    Return the env activated in current context, or the global one.
+    :rtype: ENV
+    """
+    active = _active_env.get()
+    if active is None:
+        return env
+    return active
+
+
 class ENV(object):
     __slots__ = (
-        "silent_exit",
+        "_silent_exit",
+        "lazy",
         "parser",
         "_tree",
     )
+    _settings = ("silent_exit", )
 
-    def __init__(self):
+    def __init__(self, silent_exit=True, lazy=False, tree=None):
         """
         :type parser: cmdtree.parser.AParser
+        :type tree: cmdtree.tree.CmdTree
+        """
+        self._silent_exit = silent_exit
+        # build parsers of commands on demand, set it before
+        # any command is registered.
+        self.lazy = lazy
+        self._tree = tree
+
+    @property
+    def silent_exit(self):
+        overrides = _overrides.get().get(self)
+        if overrides is not None and "silent_exit" in overrides:
+            return overrides['silent_exit']
+        return self._silent_exit
+
+    @silent_exit.setter
+    def silent_exit(self, value):
+        self._silent_exit = value
+
+    @contextmanager
+    def settings(self, **settings):
+        """
+        Override settings like `silent_exit` in current context only,
+        other threads and coroutines still see the values of env.
+        """
+        for name in settings:
+            if name not in self._settings:
+                raise TypeError("Unknown setting `{0}`".format(name))
+        overrides = dict(_overrides.get())
+        overrides[self] = dict(overrides.get(self, {}), **settings)
+        token = _overrides.set(overrides)
+        try:
+            yield self
+        finally:
+            _overrides.reset(token)
+
+    @contextmanager
+    def activate(self):
+        """
+        Make env the one of `current_env` in current context, commands
+        registered by shortcuts go to its tree.
         """
-        self.silent_exit = True
-        self._tree = None
+        token = _active_env.set(self)
+        try:
+            yield self
+        finally:
+            _active_env.reset(token)
 
     def entry(self, args=None, namespace=None):
-        return self.tree.root.run(args, namespace)
+        with self.activate():
+            return self.tree.dispatch(args, namespace)
+
+    def invoke(self, args, namespace=None):
+        """
+        Run args and return `cmdtree.parser.Result` instead of printing
+        errors or exiting.
+        """
+        with self.activate():
+            return self.tree.invoke(args, namespace)
+
+    def entry_async(self, args=None, namespace=None):
+        """
+        Return a coroutine which dispatches args, await it in an event loop.
+        """
+        from cmdtree.aio import activated
+        return activated(self, self.tree.dispatch_async(args, namespace))
+
+    def entry_batch(self, source=None, sep="\n", out=None):
+        """
+        Run each invocation of source in this process, one invocation
+        per line (or per NUL-separated record if sep is "\0").
+        Results which are not None are written to out, failed invocations
+        are reported to stderr without stopping the batch.
+        :param source: path of file, "-" or None for stdin, or a file object
+        :return: 0 if all of the invocations succeed, else 1
+        """
+        from cmdtree.parser import call_for_status
+        from cmdtree.streams import iter_records
+
+        if out is None:
+            out = sys.stdout
+        if source is None or source == "-":
+            source = sys.stdin
+        if isinstance(source, six.string_types):
+            with open(source, "rb") as f:
+                return self.entry_batch(f, sep=sep, out=out)
+        stream = getattr(source, "buffer", source)
+        if isinstance(sep, six.text_type):
+            sep = sep.encode("ascii")
+        encoding = _get_argv_encoding()
+
+        def run_line(line):
+            return self.entry(shlex.split(line))
+
+        failed = 0
+        for index, line in enumerate(iter_records(stream, sep=sep), 1):
+            if isinstance(line, bytes):
+                line = line.decode(encoding)
+            if not line.strip():
+                continue
+            status, result = call_for_status(run_line, line)
+            if status != 0:
+                failed += 1
+                sys.stderr.write(
+                    "invocation #{index} `{line}` failed with status "
+                    "{status}: {error}\n".format(
+                        index=index,
+                        line=line,
+                        status=status,
+                        error=result,
+                    )
+                )
+            elif result is not None:
+                out.write("{0}\n".format(result))
+        out.flush()
+        return 1 if failed else 0
+
+    def serve(self, path):
+        """
+        Keep the tree resident and serve invocations from `cmdtree.client`
+        on UNIX socket path until the process is killed.
+        """
+        from cmdtree.server import serve
+        serve(path, env=self)
 
     @property
     def tree(self):
@@ -22,7 +167,7 @@ class ENV(object):
         """
         from cmdtree.tree import CmdTree
         if self._tree is None:
-            self._tree = CmdTree()
+            self._tree = CmdTree(lazy=self.lazy)
         return self._tree
 
     @property
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+
+from cmdtree._compat import ContextVar
+
+# scope of the running dispatch, see `scope`
+_current = ContextVar("cmdtree_resources", default=None)
+
+
+class Resources(object):
+    """
+    Close functions of the resources opened for one dispatch, like
+    the files opened by parameter types while parsing its args.
+    """
+    __slots__ = ("_closers", )
+
+    def __init__(self):
+        self._closers = []
+
+    def add(self, close):
+        self._closers.append(close)
+
+    def close(self):
+        """
+        Call the close functions in reverse order of adding, all of them
+        are called even if some fail, the first error is raised.
+        """
+        error = None
+        while self._closers:
+            close = self._closers.pop()
+            try:
+                close()
+            except Exception as e:
+                if error is None:
+                    error = e
+        if error is not None:
+            raise error
+
+
+def register(close):
+    """
+    Call close when the running dispatch completes.
+    :return: False if there is no running dispatch, close should be
+    called by whoever opened the resource.
+    """
+    resources = _current.get()
+    if resources is None:
+        return False
+    resources.add(close)
+    return True
+
+
+@contextmanager
+def scope():
+    """
+    Close the resources registered in the block when it exits,
+    the ones of an outer scope are kept until that one exits.
+    """
+    resources = Resources()
+    token = _current.set(resources)
+    try:
+        yield resources
+    finally:
+        _current.reset(token)
+        resources.close()
@@ -0,0 +1,260 @@
+import io
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import traceback
+
+import six
+from six.moves import socketserver
+
+from cmdtree import client
+from cmdtree._compat import ContextVar
+from cmdtree.exceptions import ArgumentParseError
+from cmdtree.paths import base_dir
+from cmdtree.registry import env as global_env
+
+# context variable follows coroutines submitted to the shared loop
+_request = ContextVar("cmdtree_request", default=None)
+
+
+def current_request():
+    """
+    Return the request served by current thread, commands running in
+    server should use its `cwd` and `environ` instead of the process ones,
+    which are shared by all of the concurrent requests.
+    :rtype: Request
+    """
+    return _request.get()
+
+
+class _FrameWriter(io.RawIOBase):
+
+    def __init__(self, sock, channel, lock):
+        self.sock = sock
+        self.channel = channel
+        self.lock = lock
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # bytes of memoryview is its repr on python 2
+        data = memoryview(data).tobytes()
+        if data:
+            with self.lock:
+                client.write_frame(self.sock, self.channel, data)
+        return len(data)
+
+
+class _FrameReader(io.RawIOBase):
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.pending = b""
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.eof:
+            channel, payload = client.read_frame(self.sock)
+            if channel != client.STDIN:
+                continue
+            if not payload:
+                self.eof = True
+            self.pending = payload
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+class Request(object):
+    __slots__ = (
+        "argv",
+        "cwd",
+        "environ",
+        "stdin",
+        "stdout",
+        "stderr",
+    )
+
+    def __init__(self, sock, argv, cwd, environ):
+        lock = threading.Lock()
+        self.argv = argv
+        self.cwd = cwd
+        self.environ = environ
+        stdin = io.BufferedReader(_FrameReader(sock), client.CHUNK_SIZE)
+        stdout = io.BufferedWriter(
+            _FrameWriter(sock, client.STDOUT, lock), client.CHUNK_SIZE
+        )
+        stderr = _FrameWriter(sock, client.STDERR, lock)
+        if six.PY2:
+            # like the stdio of python 2, which is written with str
+            self.stdin, self.stdout, self.stderr = stdin, stdout, stderr
+            return
+        self.stdin = io.TextIOWrapper(stdin, encoding="utf-8")
+        self.stdout = io.TextIOWrapper(stdout, encoding="utf-8")
+        self.stderr = io.TextIOWrapper(
+            io.BufferedWriter(stderr), encoding="utf-8", write_through=True,
+        )
+
+    def flush(self):
+        self.stdout.flush()
+        self.stderr.flush()
+
+
+class _StreamRouter(object):
+    """
+    Stand-in of sys.stdin/stdout/stderr which sends every operation to
+    the stream of the request served by current thread.
+    """
+
+    def __init__(self, name, default):
+        self._name = name
+        self._default = default
+
+    def _target(self):
+        request = current_request()
+        if request is None:
+            return self._default
+        return getattr(request, self._name)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __iter__(self):
+        return iter(self._target())
+
+
+_STREAM_NAMES = ("stdin", "stdout", "stderr")
+
+
+def _install_routers():
+    """
+    :return: True if routers are installed by this call.
+    """
+    if isinstance(sys.stdout, _StreamRouter):
+        return False
+    for name in _STREAM_NAMES:
+        setattr(sys, name, _StreamRouter(name, getattr(sys, name)))
+    return True
+
+
+def _uninstall_routers():
+    for name in _STREAM_NAMES:
+        stream = getattr(sys, name)
+        if isinstance(stream, _StreamRouter):
+            setattr(sys, name, stream._default)
+
+
+def _exit_status(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    return 1
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        sock = self.request
+        channel, payload = client.read_frame(sock)
+        if channel != client.REQUEST:
+            return
+        data = json.loads(payload.decode("utf-8"))
+        request = Request(sock, data['argv'], data['cwd'], data['env'])
+        token = _request.set(request)
+        try:
+            try:
+                # relative paths of arguments are the ones of client
+                with base_dir(request.cwd):
+                    self.server.env.entry(request.argv)
+                status = 0
+            except SystemExit as e:
+                status = _exit_status(e.code)
+            except ArgumentParseError:
+                status = 2
+            except Exception:
+                traceback.print_exc(file=request.stderr)
+                status = 1
+            request.flush()
+        finally:
+            _request.reset(token)
+        client.write_frame(
+            sock, client.EXIT, str(status).encode("ascii")
+        )
+
+
+def _is_stale_socket(path):
+    """
+    Return True if path is a socket which no server accepts on.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    if not stat.S_ISSOCK(mode):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        return True
+    finally:
+        sock.close()
+    return False
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Keep the command tree of env resident and serve invocations from
+    `cmdtree.client` over a UNIX domain socket, one thread per client.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, env=None):
+        """
+        :type env: cmdtree.registry.ENV
+        """
+        self.path = path
+        self.env = env or global_env
+        # left by a server which is gone, others make bind fail
+        if _is_stale_socket(path):
+            os.unlink(path)
+        self._routers_installed = False
+        self._bound = False
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self._bound = True
+
+    def process_request(self, request, client_address):
+        # stdio may be replaced after server starts, route it again.
+        if _install_routers():
+            self._routers_installed = True
+        socketserver.ThreadingMixIn.process_request(
+            self, request, client_address
+        )
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if self._routers_installed:
+            _uninstall_routers()
+        # it is the file of others if bind failed
+        if self._bound and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve(path, env=None):
+    server = Server(path, env=env)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
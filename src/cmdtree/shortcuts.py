@@ -1,4 +1,8 @@
-from cmdtree.registry import env
+import six
+
+from cmdtree._compat import iscoroutinefunction
+from cmdtree.lazy import LazyFunc
+from cmdtree.registry import current_env
 
 
 CMD_META_NAME = "meta"
@@ -45,7 +49,55 @@ def apply2parser(cmd_proxy, parser):
     return parser
 
 
-def _mk_group(name, help=None, path_prefix=None):
+def _apply_inferred(cmd_proxy, func, parser):
+    """
+    Apply arguments and options inferred from the signature of func in
+    order of the parameters, the ones declared by decorators under
+    `command` or `group` take the place of the inferred ones.
+    :return: names of the inferred parameters
+    :rtype: frozenset
+    """
+    from cmdtree.infer import infer_params, param_name
+
+    declared = {}
+    if isinstance(cmd_proxy, CmdProxy):
+        parser_proxy = cmd_proxy.meta.parser
+        for method, calls in (
+                ("option", parser_proxy.options),
+                ("argument", parser_proxy.arguments),
+        ):
+            for args, kwargs in calls:
+                declared[param_name(args[0])] = (method, args, kwargs)
+    inferred = set()
+    for method, name, kwargs in infer_params(func):
+        param = param_name(name)
+        call = declared.pop(param, None)
+        if call is None:
+            inferred.add(param)
+            getattr(parser, method)(name, **kwargs)
+        else:
+            method, args, kwargs = call
+            getattr(parser, method)(*args, **kwargs)
+    for method, args, kwargs in declared.values():
+        getattr(parser, method)(*args, **kwargs)
+    return frozenset(inferred)
+
+
+def _check_not_inferred(cmd, name):
+    if not cmd.inferred:
+        return
+    from cmdtree.infer import param_name
+    if param_name(name) in cmd.inferred:
+        raise ValueError(
+            "Parameter `{name}` of `{cmd}` is inferred from its signature, "
+            "declare it under `command` or `group` to override".format(
+                name=name,
+                cmd=cmd.meta.name,
+            )
+        )
+
+
+def _mk_group(name, help=None, path_prefix=None, infer=False):
 
     def wrapper(func):
         if isinstance(func, Group):
@@ -59,13 +111,15 @@ def _mk_group(name, help=None, path_prefix=None):
 
         if isinstance(func, CmdProxy):
             _func = func.func
+        if isinstance(_func, six.string_types):
+            _func = LazyFunc(_func)
 
         if name is None:
             _name = _get_func_name(_func)
 
         full_path = _get_cmd_path(path_prefix, _name)
 
-        tree = env.tree
+        tree = current_env().tree
         parser = tree.add_parent_commands(full_path, help=help)['cmd']
         _group = Group(
             _func,
@@ -74,12 +128,15 @@ def _mk_group(name, help=None, path_prefix=None):
             help=help,
             full_path=full_path,
         )
-        apply2parser(func, parser)
+        if infer:
+            _group.inferred = _apply_inferred(func, _func, parser)
+        else:
+            apply2parser(func, parser)
         return _group
     return wrapper
 
 
-def _mk_cmd(name, help=None, path_prefix=None):
+def _mk_cmd(name, help=None, path_prefix=None, infer=False):
     def wrapper(func):
         if isinstance(func, Cmd):
             raise ValueError(
@@ -91,13 +148,15 @@ def _mk_cmd(name, help=None, path_prefix=None):
 
         if isinstance(func, CmdProxy):
             _func = func.func
+        if isinstance(_func, six.string_types):
+            _func = LazyFunc(_func)
 
         _name = name
         if name is None:
             _name = _get_func_name(_func)
 
         full_path = _get_cmd_path(path_prefix, _name)
-        tree = env.tree
+        tree = current_env().tree
         parser = tree.add_commands(full_path, _func, help=help)
         _cmd = Cmd(
             _func,
@@ -106,7 +165,10 @@ def _mk_cmd(name, help=None, path_prefix=None):
             help=help,
             full_path=full_path,
         )
-        apply2parser(func, parser)
+        if infer:
+            _cmd.inferred = _apply_inferred(func, _func, parser)
+        else:
+            apply2parser(func, parser)
 
         return _cmd
     return wrapper
@@ -176,17 +238,24 @@ class Group(object):
             parser=parser,
         )
         self.help = help
+        self.is_coroutine = iscoroutinefunction(func)
+        # names of parameters inferred from signature of func
+        self.inferred = frozenset()
 
     def __call__(self, *args, **kwargs):
         # TODO(winkidney): This func will not work in
         # any case now.Be left now for possible call.
         return self.func(*args, **kwargs)
 
-    def command(self, name=None, help=None):
-        return _mk_cmd(name, help=help, path_prefix=self.meta.full_path)
+    def command(self, name=None, help=None, infer=False):
+        return _mk_cmd(
+            name, help=help, path_prefix=self.meta.full_path, infer=infer
+        )
 
-    def group(self, name=None, help=None):
-        return _mk_group(name, help=help, path_prefix=self.meta.full_path)
+    def group(self, name=None, help=None, infer=False):
+        return _mk_group(
+            name, help=help, path_prefix=self.meta.full_path, infer=infer
+        )
 
 
 class Cmd(object):
@@ -198,6 +267,9 @@ class Cmd(object):
             parser=parser,
         )
         self.help = help
+        self.is_coroutine = iscoroutinefunction(func)
+        # names of parameters inferred from signature of func
+        self.inferred = frozenset()
 
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
@@ -205,32 +277,58 @@ class Cmd(object):
 
 def _get_func_name(func):
     assert callable(func)
+    if isinstance(func, LazyFunc):
+        return func.ref.partition(":")[2].rsplit(".", 1)[-1]
     return func.__name__
 
 
-def group(name=None, help=None):
+def group(name=None, help=None, infer=False):
     """
     Group of commands, you can add sub-command/group in this group.
+    :param infer: infer arguments of the group from the signature of
+    function, see `command`.
     :rtype : AParser
     """
-    return _mk_group(name, help=help)
+    return _mk_group(name, help=help, infer=infer)
 
 
-def command(name=None, help=None):
-    return _mk_cmd(name, help=help)
+def command(name=None, help=None, infer=False):
+    """
+    Register a function as command.
+    The decorated object can also be a reference like "package.module:func"
+    so the module is imported only when the command is called:
+        argument("disk_id")(command("delete")("pkg.disks:delete"))
+    :param infer: add arguments and options for the parameters of
+    function which are not declared by `argument` or `option` under
+    this decorator, see `cmdtree.infer.infer_params`. They are recorded
+    as calls of parser, so a tree snapshot keeps them without inferring
+    again.
+    :rtype : Cmd
+    """
+    return _mk_cmd(name, help=help, infer=infer)
 
 
-def argument(name, help=None, type=None):
+def argument(name, help=None, type=None, nargs=None, map=False,
+             argfile=False):
+    kwargs = {"help": help, "type": type}
+    if nargs is not None:
+        kwargs['nargs'] = nargs
+    if map:
+        kwargs['map'] = map
+    if argfile:
+        kwargs['argfile'] = argfile
 
     def wrapper(func):
+        if isinstance(func, (Group, Cmd)):
+            _check_not_inferred(func, name)
         if isinstance(func, (Group, Cmd, CmdProxy)):
             parser = func.meta.parser
-            parser.argument(name, help=help, type=type)
+            parser.argument(name, **kwargs)
             return func
         else:
             meta_cmd = CmdProxy(func)
             parser = meta_cmd.meta.parser
-            parser.argument(name, help=help, type=type)
+            parser.argument(name, **kwargs)
             return meta_cmd
     return wrapper
 
@@ -238,6 +336,8 @@ def argument(name, help=None, type=None):
 def option(name, help=None, is_flag=False, default=None, type=None):
 
     def wrapper(func):
+        if isinstance(func, (Group, Cmd)):
+            _check_not_inferred(func, name)
         if isinstance(func, (Group, Cmd, CmdProxy)):
             parser = func.meta.parser
             parser.option(
@@ -0,0 +1,213 @@
+import os
+import sys
+import tempfile
+from functools import partial
+
+from six.moves import cPickle as pickle
+
+from cmdtree.lazy import LazyFunc, get_ref
+from cmdtree.parser import LazyAParser
+from cmdtree.tree import CmdTree
+
+SNAPSHOT_VERSION = 2
+
+
+def _get_module_file(module_name):
+    module = sys.modules.get(module_name)
+    filename = getattr(module, "__file__", None)
+    if filename is None:
+        return None
+    if filename.endswith((".pyc", ".pyo")):
+        filename = filename[:-1]
+    return os.path.abspath(filename)
+
+
+def _stat_sources(filenames):
+    """
+    :return: {filename: (mtime, size)}, value is None if file is missing.
+    """
+    stats = {}
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            stats[filename] = None
+        else:
+            stats[filename] = (stat.st_mtime, stat.st_size)
+    return stats
+
+
+def _dump_node(node, modules, render_help, is_root=False):
+    parser = node['cmd']
+    func_ref = None
+    help = None
+    rendered_help = None
+    if render_help and not is_root:
+        rendered_help = parser.format_help()
+    if isinstance(parser, LazyAParser):
+        help = parser.help
+        if parser.func is not None:
+            func_ref = get_ref(parser.func)
+            modules.add(func_ref.partition(":")[0])
+    elif not is_root:
+        raise ValueError(
+            "Node `{name}` is not lazy, only tree built with "
+            "`lazy=True` can be dumped".format(name=node['name'])
+        )
+    return {
+        "name": node['name'],
+        "help": help,
+        "func": func_ref,
+        "calls": list(getattr(parser, "calls", ())),
+        "rendered_help": rendered_help,
+        "children": [
+            _dump_node(child, modules, render_help)
+            for child in node['children'].values()
+        ],
+    }
+
+
+def dump(tree, path, sources=(), render_help=True):
+    """
+    Write the tree to path.
+    The snapshot is invalidated when the module of any command function
+    or any file in sources changes.
+    :type tree: cmdtree.tree.CmdTree
+    :type sources: list or tuple
+    :param render_help: save the help message of every command, which
+    is printed for `--help` without building the parsers on the path.
+    """
+    modules = set()
+    root = _dump_node(tree.tree, modules, render_help, is_root=True)
+    filenames = set(os.path.abspath(filename) for filename in sources)
+    for module_name in modules:
+        filename = _get_module_file(module_name)
+        if filename is not None:
+            filenames.add(filename)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "python": tuple(sys.version_info[:2]),
+        "sources": _stat_sources(filenames),
+        # rendered help contains prog, it is only used with the same one
+        "prog": tree.root.prog,
+        "root": root,
+    }
+    dirname = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".cmdtree-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        getattr(os, "replace", os.rename)(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _add_node(tree, path, node_data, with_help):
+    if node_data['func'] is not None:
+        tree.add_commands(
+            path,
+            LazyFunc(node_data['func']),
+            help=node_data['help'],
+        )
+        node = tree.get_cmd_by_path(path)
+    else:
+        node = tree.add_parent_commands(path, help=node_data['help'])
+    _replay(node.cmd, node_data['calls'])
+    if node_data['children']:
+        node.expander = partial(_expand, tree, node_data, with_help)
+        # parser may be built before the node is walked
+        hooks = getattr(node.cmd, "hooks", None)
+        if hooks is not None:
+            hooks.append(partial(_expand_hook, node))
+    if with_help:
+        node.cmd.rendered_help = node_data['rendered_help']
+
+
+def _expand(tree, node_data, with_help, node):
+    for child_data in node_data['children']:
+        _add_node(
+            tree, node.path + (child_data['name'], ), child_data, with_help
+        )
+    if with_help and node.path:
+        # adding the children resets it
+        node.cmd.rendered_help = node_data['rendered_help']
+
+
+def _expand_hook(node):
+    return node.children
+
+
+def _replay(parser, calls):
+    for method, args, kwargs in calls:
+        getattr(parser, method)(*args, **kwargs)
+
+
+def load(path):
+    """
+    Load a lazy tree from snapshot.
+    :return: None if the snapshot does not exist or is out of date.
+    :rtype: cmdtree.tree.CmdTree
+    """
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION or \
+            data.get("python") != tuple(sys.version_info[:2]):
+        return None
+    if _stat_sources(data['sources']) != data['sources']:
+        return None
+    tree = CmdTree(lazy=True)
+    _replay(tree.root, data['root']['calls'])
+    # nodes below the root are added when they are walked, so loading
+    # time grows with the depth of dispatched path instead of the size
+    # of tree. The root parser is not lazy, its children are always used.
+    _expand(
+        tree, data['root'], data['prog'] == tree.root.prog, tree.tree
+    )
+    return tree
+
+
+def load_or_build(path, build, sources=()):
+    """
+    Load the tree from snapshot, or call build to make a new one
+    then save it to path.
+    :type build: callable
+    :param build: return a lazy `CmdTree`, the files of its module and
+    of the modules imported by it, like the ones registering the
+    commands, are always snapshot sources.
+    :rtype: cmdtree.tree.CmdTree
+    """
+    tree = load(path)
+    if tree is not None:
+        return tree
+    imported = set(sys.modules)
+    tree = build()
+    module_names = set(sys.modules) - imported
+    module_names.add(getattr(build, "__module__", None))
+    sources = list(sources)
+    for module_name in module_names:
+        filename = _get_module_file(module_name)
+        if filename is not None:
+            sources.append(filename)
+    dump(tree, path, sources=sources)
+    return tree
+
+
+def entry(path, build, args=None, namespace=None, sources=()):
+    """
+    Dispatch args with the tree in snapshot, only the module of the
+    invoked command will be imported if the snapshot is up to date.
+    Example:
+
+        def build():
+            env.lazy = True
+            import myapp.commands
+            return env.tree
+
+        snapshot.entry("/tmp/myapp.tree", build)
+    """
+    tree = load_or_build(path, build, sources=sources)
+    return tree.dispatch(args, namespace)
@@ -0,0 +1,181 @@
+import json
+import os
+import sys
+from functools import partial
+
+import six
+
+from cmdtree import types
+from cmdtree._compat import OrderedDict
+from cmdtree.parser import AParser, LazyAParser
+from cmdtree.tree import CmdTree
+
+# type names usable in spec, a name of class takes its arguments
+# from the type spec like {"name": "choices", "choices": ["a", "b"]}
+TYPES = {
+    "unprocessed": types.UNPROCESSED,
+    "string": types.STRING,
+    "int": types.INT,
+    "float": types.FLOAT,
+    "bool": types.BOOL,
+    "uuid": types.UUID,
+    "int_range": types.IntRange,
+    "choices": types.Choices,
+    "file": types.File,
+    "mmap_file": types.MMapFile,
+    "lazy_file": types.LazyFile,
+    "compressed_file": types.CompressedFile,
+    "paths": types.Paths,
+    "stream": types.STREAM,
+    "lines": types.Lines,
+    "records": types.Records,
+}
+
+_ROOT_KEYS = frozenset(("prog", "help", "arguments", "options", "commands"))
+_COMMAND_KEYS = frozenset(("help", "func", "arguments", "options", "commands"))
+
+
+# keep the order of commands in spec, json of python 2.6 can not
+_JSON_KWARGS = {"object_pairs_hook": OrderedDict} \
+    if sys.version_info >= (2, 7) else {}
+
+
+def _read_json(filename):
+    with open(filename) as f:
+        return json.load(f, **_JSON_KWARGS)
+
+
+def _check_keys(spec, allowed, path):
+    unknown = set(spec) - allowed
+    if unknown:
+        raise ValueError(
+            "Unknown keys {keys} in spec of command `{path}`".format(
+                keys=sorted(unknown),
+                path=" ".join(path) or "root",
+            )
+        )
+
+
+def make_type(type_spec):
+    """
+    :type type_spec: str or dict
+    :param type_spec: name in `TYPES` or {"name": name, **arguments}
+    :rtype: cmdtree.types.ParamTypeFactory
+    """
+    if isinstance(type_spec, six.string_types):
+        name, kwargs = type_spec, {}
+    else:
+        kwargs = dict(type_spec)
+        name = kwargs.pop("name", None)
+    if name not in TYPES:
+        raise ValueError("Unknown type `{name}` in spec".format(name=name))
+    param_type = TYPES[name]
+    if isinstance(param_type, types.ParamTypeFactory):
+        if kwargs:
+            raise ValueError(
+                "Type `{name}` takes no arguments".format(name=name)
+            )
+        return param_type
+    # converter of values like the one of "lines"
+    if kwargs.get("type") is not None:
+        kwargs['type'] = make_type(kwargs['type'])
+    return param_type(**kwargs)
+
+
+def _apply_params(parser, spec):
+    for method in ("argument", "option"):
+        for param in spec.get(method + "s", ()):
+            kwargs = dict(param)
+            if kwargs.get("type") is not None:
+                kwargs['type'] = make_type(kwargs['type'])
+            getattr(parser, method)(**kwargs)
+
+
+def _expand(tree, commands, base_dir, node):
+    if isinstance(commands, six.string_types):
+        filename = os.path.join(base_dir, commands)
+        commands = _read_json(filename)
+        base_dir = os.path.dirname(filename)
+    for name, spec in commands.items():
+        _add_command(tree, node.path + (name, ), spec, base_dir)
+
+
+def _expand_hook(node):
+    return node.children
+
+
+def _set_expander(tree, node, commands, base_dir):
+    node.expander = partial(_expand, tree, commands, base_dir)
+    # parser may be built before the node is walked, like `root.run`
+    hooks = getattr(node.cmd, "hooks", None)
+    if hooks is not None:
+        hooks.append(partial(_expand_hook, node))
+
+
+def _add_command(tree, path, spec, base_dir):
+    _check_keys(spec, _COMMAND_KEYS, path)
+    if spec.get("func") is not None:
+        tree.add_commands(path, spec['func'], help=spec.get("help"))
+        node = tree.get_cmd_by_path(path)
+    else:
+        node = tree.add_parent_commands(path, help=spec.get("help"))
+    _apply_params(node.cmd, spec)
+    if spec.get("commands"):
+        _set_expander(tree, node, spec['commands'], base_dir)
+    return node
+
+
+def load(spec, base_dir=None):
+    """
+    Build a tree from spec like:
+
+        {
+            "prog": "computer",
+            "commands": {
+                "disks": {
+                    "help": "manage disks",
+                    "commands": {
+                        "show": {
+                            "func": "myapp.disks:show",
+                            "arguments": [{"name": "disk_id", "type": "int"}],
+                            "options": [{"name": "verbose", "is_flag": true}]
+                        }
+                    }
+                },
+                "network": {"commands": "network.json"}
+            }
+        }
+
+    Items of "arguments" and "options" are the keyword arguments of
+    `AParser.argument` and `AParser.option`, with type names in `TYPES`.
+    "commands" may be the name of another spec file relative to
+    base_dir, which is read when the group is entered.
+    Nothing but the root is added here, the commands of a group are
+    added when its children are walked or its parser is built, so
+    loading time does not grow with the size of spec.
+    :type spec: dict
+    :rtype: cmdtree.tree.CmdTree
+    """
+    _check_keys(spec, _ROOT_KEYS, ())
+    root = LazyAParser(
+        partial(AParser, prog=spec.get("prog"), description=spec.get("help")),
+        help=spec.get("help"),
+    )
+    tree = CmdTree(root, lazy=True)
+    _apply_params(root, spec)
+    if spec.get("commands"):
+        _set_expander(
+            tree, tree.tree, spec['commands'], base_dir or os.getcwd()
+        )
+    return tree
+
+
+def load_file(filename):
+    """
+    Build a tree from a JSON spec file, see `load`.
+    :rtype: cmdtree.tree.CmdTree
+    """
+    return load(
+        _read_json(filename),
+        base_dir=os.path.dirname(os.path.abspath(filename)),
+    )
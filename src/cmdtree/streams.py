@@ -0,0 +1,126 @@
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+from cmdtree._compat import get_filesystem_encoding
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_records(stream, sep=b"\n", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split a stream into records by sep, reading it in chunks so the
+    memory used only depends on chunk size and record length.
+    The empty record after the last separator is dropped.
+    :type stream: file object opened in binary or text mode
+    :param sep: separator of the same type (bytes or str) as the stream.
+    """
+    read = getattr(stream, "read1", None) or stream.read
+    pending = None
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        if pending:
+            chunk = pending + chunk
+        records = chunk.split(sep)
+        pending = records.pop()
+        for record in records:
+            yield record
+    if pending:
+        yield pending
+
+
+def open_input(filename):
+    """
+    :param filename: path of file or "-" for stdin
+    :return: binary stream of file, which is not closed for stdin
+    """
+    if filename == "-":
+        return getattr(sys.stdin, "buffer", sys.stdin)
+    return open(filename, "rb")
+
+
+def decode_arg(value):
+    # decode like the arguments in argv
+    if six.PY2:
+        return value
+    return value.decode(get_filesystem_encoding(), "surrogateescape")
+
+
+def iter_file_records(filename, sep=b"\n", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Records of file split by sep, see `iter_records`.
+    The file is opened on the first pull and closed after the last one.
+    :param filename: path of file or "-" for stdin
+    """
+    stream = open_input(filename)
+    try:
+        for record in iter_records(stream, sep, chunk_size):
+            yield record
+    finally:
+        if filename != "-":
+            stream.close()
+
+
+def iter_args(filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Arguments in file one per line, blank lines are skipped.
+    :param filename: path of file or "-" for stdin
+    """
+    for line in iter_file_records(filename, b"\n", chunk_size):
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if line:
+            yield decode_arg(line)
+
+
+def prefetch(iterable, size):
+    """
+    Pull items of iterable in a thread ahead of the consumer, at most
+    size of them wait to be consumed, so slow producing like walking
+    directories overlaps with consuming.
+    Errors of iterable are raised to the consumer, and iterable is
+    closed once the consumer stops.
+    """
+    items = queue.Queue(size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="cmdtree-prefetch")
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
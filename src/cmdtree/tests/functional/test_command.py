@@ -59,4 +59,16 @@ def test_should_double_option_order_do_not_cause_calling_error():
 
     assert entry(
         ["test_order", "--feed", "fake"]
-    ) == "fake"
\ No newline at end of file
+    ) == "fake"
+
+def show_disk(disk_id):
+    return disk_id
+
+
+def test_should_command_accept_lazy_reference():
+    argument("disk_id")(
+        command("lazy_show")(
+            "cmdtree.tests.functional.test_command:show_disk"
+        )
+    )
+    assert entry(["lazy_show", "disk1"]) == "disk1"
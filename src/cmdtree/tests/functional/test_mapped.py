@@ -0,0 +1,14 @@
+import pytest
+
+from cmdtree import INT, argument, command, entry
+
+
+@argument("value", nargs="+", type=INT, map=True)
+@command(help="square each of the values")
+def square(value):
+    return value * value
+
+
+@pytest.mark.parametrize("jobs", ("1", "2"))
+def test_should_map_decorated_command(jobs):
+    assert entry(["square", "1", "2", "4", "--jobs", jobs]) == [1, 4, 16]
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+SCRIPT = """
+from cmdtree.parser import AParser
+
+parser = AParser()
+parser.add_output_option()
+parser.add_cmd("count", func=lambda: iter(range(10 ** 8)))
+parser.run(["count"])
+"""
+
+
+def test_should_exit_cleanly_when_piped_to_head():
+    process = subprocess.Popen(
+        [sys.executable, "-c", SCRIPT],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    first_line = process.stdout.readline()
+    process.stdout.close()
+    stderr = process.stderr.read()
+    process.stderr.close()
+    assert process.wait() == 0
+    assert first_line == b"0\n"
+    assert stderr == b""
@@ -0,0 +1,159 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+import six
+
+from cmdtree import client
+from cmdtree.registry import ENV
+from cmdtree.server import Server, current_request
+from cmdtree.types import File, INT, Paths
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(__import__("socket"), "AF_UNIX"),
+    reason="UNIX domain socket is not supported",
+)
+
+
+@pytest.fixture()
+def server_env():
+    server_env = ENV()
+    tree = server_env.tree
+    tree.add_commands(
+        ["echo"], lambda value: sys.stdout.write(value + "\n")
+    ).argument("value")
+    tree.add_commands(
+        ["upper"], lambda: sys.stdout.write(sys.stdin.read().upper())
+    )
+    tree.add_commands(
+        ["cwd"], lambda: sys.stdout.write(current_request().cwd)
+    )
+    tree.add_commands(["fail"], lambda: 1 / 0)
+    tree.add_commands(
+        ["spam"], lambda size: sys.stdout.write("x" * size)
+    ).argument("size", type=INT)
+    tree.add_commands(
+        ["cat"], lambda file: sys.stdout.write(file.read())
+    ).argument("file", type=File())
+    tree.add_commands(
+        ["ls"], lambda path: sys.stdout.write(
+            " ".join(sorted(entry.name for entry in path))
+        )
+    ).argument("path", type=Paths())
+    return server_env
+
+
+@pytest.fixture()
+def socket_path(server_env, tmpdir):
+    path = str(tmpdir.join("cmdtree.sock"))
+    server = Server(path, env=server_env)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05, ))
+    thread.daemon = True
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def run(path, argv, stdin=b"", **kwargs):
+    stdout, stderr = six.BytesIO(), six.BytesIO()
+    status = client.run(
+        path, argv,
+        stdin=six.BytesIO(stdin), stdout=stdout, stderr=stderr,
+        **kwargs
+    )
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+def test_should_forward_stdout(socket_path):
+    assert run(socket_path, ["echo", "hello"]) == (0, b"hello\n", b"")
+
+
+def test_should_forward_stdin(socket_path):
+    status, stdout, _ = run(socket_path, ["upper"], stdin=b"abc\ndef")
+    assert (status, stdout) == (0, b"ABC\nDEF")
+
+
+def test_should_forward_cwd(socket_path):
+    assert run(socket_path, ["cwd"], cwd="/fake")[1] == b"/fake"
+
+
+def test_should_resolve_relative_paths_against_cwd(socket_path, tmpdir):
+    cwd = tmpdir.mkdir("client")
+    cwd.join("data.txt").write("data")
+    assert run(socket_path, ["cat", "data.txt"], cwd=str(cwd))[:2] == (
+        0, b"data"
+    )
+    assert run(socket_path, ["ls", "*.txt"], cwd=str(cwd))[:2] == (
+        0, b"data.txt"
+    )
+    assert run(socket_path, ["cat", "data.txt"])[0] == 2
+
+
+def test_should_return_exit_status(socket_path):
+    status, _, stderr = run(socket_path, ["fake"])
+    assert status == 2
+    assert b"invalid choice" in stderr
+    status, _, stderr = run(socket_path, ["fail"])
+    assert status == 1
+    assert b"ZeroDivisionError" in stderr
+
+
+def test_should_serve_concurrent_clients(socket_path):
+    results = {}
+
+    def call(value):
+        results[value] = run(socket_path, ["echo", value])
+
+    threads = [
+        threading.Thread(target=call, args=(str(i), )) for i in range(16)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == dict(
+        (str(i), (0, ("%d\n" % i).encode("ascii"), b"")) for i in range(16)
+    )
+
+
+def test_should_server_remove_socket_file(server_env, tmpdir):
+    path = str(tmpdir.join("cmdtree.sock"))
+    Server(path, env=server_env).server_close()
+    assert not os.path.exists(path)
+
+
+def test_should_not_block_on_unread_stdin(socket_path):
+    size = 8 * 1024 * 1024
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        run(socket_path, ["spam", str(size)], stdin=b"y" * 4 * 1024 * 1024)
+    ))
+    thread.daemon = True
+    thread.start()
+    thread.join(20)
+    assert results
+    status, stdout, _ = results[0]
+    assert (status, len(stdout)) == (0, size)
+
+
+def test_should_server_replace_stale_socket(server_env, tmpdir):
+    path = str(tmpdir.join("cmdtree.sock"))
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    Server(path, env=server_env).server_close()
+    assert not os.path.exists(path)
+
+
+def test_should_server_keep_other_files(server_env, socket_path, tmpdir):
+    path = tmpdir.join("data.txt")
+    path.write("data")
+    for used_path in (str(path), socket_path):
+        with pytest.raises(socket.error):
+            Server(used_path, env=server_env)
+        assert os.path.exists(used_path)
+    assert path.read() == "data"
+    assert run(socket_path, ["echo", "hello"])[0] == 0
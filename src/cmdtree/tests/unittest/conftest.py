@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # coroutine functions are syntax errors before python 3.5
+    collect_ignore.append("test_aio.py")
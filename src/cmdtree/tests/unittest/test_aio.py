@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture()
+def async_tree():
+    import asyncio
+    from cmdtree.tree import CmdTree
+
+    async def get_loop(value):
+        await asyncio.sleep(0)
+        return value, asyncio.get_event_loop()
+
+    tree = CmdTree()
+    tree.add_commands(["loop"], get_loop).argument("value")
+    tree.add_commands(["sync"], lambda: "sync")
+    return tree
+
+
+def test_should_run_wait_coroutine_on_shared_loop(async_tree):
+    from cmdtree import aio
+    value1, loop1 = async_tree.dispatch(["loop", "1"])
+    value2, loop2 = async_tree.dispatch(["loop", "2"])
+    assert (value1, value2) == ("1", "2")
+    assert loop1 is loop2 is aio.get_loop()
+
+
+def test_should_close_loop_create_new_one(async_tree):
+    from cmdtree import aio
+    loop = async_tree.dispatch(["loop", "1"])[1]
+    aio.close_loop()
+    assert loop.is_closed()
+    assert async_tree.dispatch(["loop", "1"])[1] is not loop
+
+
+def test_should_dispatch_async_await_in_running_loop(async_tree):
+    import asyncio
+
+    async def main():
+        value, loop = await async_tree.dispatch_async(["loop", "1"])
+        assert loop is asyncio.get_event_loop()
+        return value, await async_tree.dispatch_async(["sync"])
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(main()) == ("1", "sync")
+    finally:
+        loop.close()
+
+
+def test_should_cmd_detect_coroutine_function():
+    from cmdtree.shortcuts import Cmd
+
+    async def func():
+        pass
+
+    assert Cmd(func, "func", None).is_coroutine
+    assert not Cmd(lambda: None, "func", None).is_coroutine
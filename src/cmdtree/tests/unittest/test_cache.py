@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from cmdtree import cache
+from cmdtree.cache import DiskCache, cached
+
+
+def list_disks(zone, verbose=False):
+    return [zone, verbose]
+
+
+def _fill(path, start):
+    store = DiskCache(path, max_entries=5)
+    for index in range(start, start + 20):
+        store.set(str(index), index)
+
+
+@pytest.fixture()
+def cache_dir(tmpdir):
+    return str(tmpdir.join("cache"))
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    return now
+
+
+class TestDiskCache:
+    def test_should_get_stored_value(self, cache_dir):
+        store = DiskCache(cache_dir)
+        assert store.get("key") == (False, None)
+        store.set("key", {"a": 1})
+        assert store.get("key") == (True, {"a": 1})
+        assert store.stats()[0] == 1
+
+    def test_should_expire_entry(self, cache_dir, clock):
+        store = DiskCache(cache_dir)
+        store.set("key", 1, ttl=10)
+        clock[0] += 9
+        assert store.get("key") == (True, 1)
+        clock[0] += 1
+        assert store.get("key") == (False, None)
+        assert store.stats() == (0, 0)
+
+    def test_should_evict_least_recently_used(self, cache_dir, clock):
+        store = DiskCache(cache_dir, max_entries=2)
+        store.set("a", 1)
+        clock[0] += 1
+        store.set("b", 2)
+        clock[0] += 1
+        store.get("a")
+        clock[0] += 1
+        store.set("c", 3)
+        assert store.get("a") == (True, 1)
+        assert store.get("b") == (False, None)
+        assert store.get("c") == (True, 3)
+
+    def test_should_evict_by_size(self, cache_dir, clock):
+        store = DiskCache(cache_dir, max_bytes=150)
+        store.set("a", "x" * 100)
+        clock[0] += 1
+        store.set("b", "y" * 100)
+        assert store.get("a") == (False, None)
+        assert store.get("b") == (True, "y" * 100)
+
+    def test_should_miss_on_broken_entry(self, cache_dir):
+        store = DiskCache(cache_dir)
+        store.set("key", 1)
+        with open(os.path.join(cache_dir, "key.cache"), "wb") as f:
+            f.write(b"broken")
+        assert store.get("key") == (False, None)
+
+    def test_should_bound_entries_of_concurrent_processes(self, cache_dir):
+        with ProcessPoolExecutor(4) as executor:
+            list(executor.map(
+                _fill, [cache_dir] * 4, range(0, 80, 20)
+            ))
+        assert DiskCache(cache_dir).stats()[0] == 5
+        assert not [
+            name for name in os.listdir(cache_dir)
+            if name.startswith(".tmp-")
+        ]
+
+
+class TestCached:
+    def test_should_count_hits_and_misses(self, cache_dir):
+        func = cached(path=cache_dir)(list_disks)
+        assert func(zone="a") == ["a", False]
+        assert func(zone="a") == ["a", False]
+        assert func(verbose=True, zone="a") == ["a", True]
+        info = func.cache_info()
+        assert (info.hits, info.misses, info.entries) == (1, 2, 2)
+        func.cache_clear()
+        assert func.cache_info().entries == 0
+
+    def test_should_call_func_with_unpicklable_arguments(self, cache_dir):
+        func = cached(path=cache_dir)(list_disks)
+        zone = lambda: None
+        assert func(zone=zone) == [zone, False]
+        assert func.cache_info().entries == 0
+
+    def test_should_not_cache_exception(self, cache_dir):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise ValueError()
+
+        func = cached(path=cache_dir)(fail)
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                func()
+        assert len(calls) == 2
+
+    def test_should_compose_with_command(self, cache_dir):
+        from cmdtree.registry import ENV
+        from cmdtree.shortcuts import argument, command
+
+        other_env = ENV()
+        with other_env.activate():
+            cmd = argument("zone")(
+                command()(cached(path=cache_dir)(list_disks))
+            )
+            assert other_env.entry(["list_disks", "a"]) == ["a", False]
+            assert other_env.entry(["list_disks", "a"]) == ["a", False]
+        assert cmd.func.cache_info().hits == 1
+
+    def test_should_keep_arguments_declared_under_it(self, cache_dir):
+        from cmdtree.registry import ENV
+        from cmdtree.shortcuts import argument, command, option
+
+        other_env = ENV()
+        with other_env.activate():
+            cmd = command()(cached(path=cache_dir)(
+                option("verbose", is_flag=True)(argument("zone")(list_disks))
+            ))
+            assert cmd.meta.name == "list_disks"
+            assert other_env.entry(["list_disks", "a"]) == ["a", False]
+            assert other_env.entry(
+                ["list_disks", "a", "--verbose"]
+            ) == ["a", True]
+            assert other_env.entry(["list_disks", "a"]) == ["a", False]
+        assert cmd.func.cache_info().hits == 1
+
+    def test_should_reject_registered_command(self, cache_dir):
+        from cmdtree.registry import ENV
+        from cmdtree.shortcuts import command
+
+        with ENV().activate():
+            cmd = command()(list_disks)
+        with pytest.raises(ValueError):
+            cached(path=cache_dir)(cmd)
@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from cmdtree import completion
+from cmdtree.tree import CmdTree
+from cmdtree.types import Choices, File
+
+
+@pytest.fixture()
+def index():
+    tree = CmdTree(lazy=True)
+    docker = tree.add_parent_commands(["docker"])['cmd']
+    docker.option("host", type=Choices(["local", "remote"]))
+    computer = tree.add_parent_commands(["computer"])['cmd']
+    computer.argument("ip", type=Choices(["127.0.0.1"]))
+    tree.add_commands(["computer", "cp"], lambda **kwargs: kwargs)
+    run = tree.add_commands(["docker", "run"], lambda **kwargs: kwargs)
+    run.argument("image", type=Choices(["ubuntu", "alpine"]))
+    run.argument("script", type=File())
+    run.option("detach", is_flag=True)
+    tree.add_commands(["docker", "rm"], lambda **kwargs: kwargs)
+    tree.add_commands(["disks"], lambda **kwargs: kwargs)
+    return completion.build_index(tree)
+
+
+@pytest.mark.parametrize(
+    "words, current, expected",
+    (
+        ([], "d", ["disks", "docker"]),
+        (["docker", "--host=local"], "r", ["rm", "run"]),
+        (["docker"], "--host=r", ["--host=remote"]),
+        (["docker"], "--fake=r", []),
+        (["computer"], "", ["127.0.0.1"]),
+        (["computer", "127.0.0.1"], "", ["cp"]),
+        (["computer", "127.0.0.1", "cp"], "", []),
+        (["docker"], "", ["rm", "run"]),
+        (["docker"], "--h", ["--help", "--host"]),
+        (["docker", "--host"], "", ["local", "remote"]),
+        (["docker", "--host", "local"], "r", ["rm", "run"]),
+        (["docker", "run"], "", ["alpine", "ubuntu"]),
+        (["docker", "run", "--detach"], "u", ["ubuntu"]),
+        (["docker", "run"], "-", ["--detach", "--help", "-h"]),
+        (["fake"], "", ["computer", "disks", "docker"]),
+    )
+)
+def test_should_complete_from_index(index, words, current, expected):
+    assert sorted(completion.complete(index, words, current)) == expected
+
+
+def test_should_complete_file_hint(index, tmpdir):
+    tmpdir.join("script.sh").write("")
+    tmpdir.mkdir("scripts")
+    prefix = str(tmpdir.join("scr"))
+    assert completion.complete(
+        index, ["docker", "run", "ubuntu"], prefix
+    ) == [
+        str(tmpdir.join("script.sh")),
+        str(tmpdir.join("scripts")) + "/",
+    ]
+
+
+def test_should_main_print_candidates_from_index_file(index, tmpdir, capsys):
+    path = tmpdir.join("index.json")
+    path.write(json.dumps(index))
+    assert completion.main([str(path), "--", "docker", "r"]) == 0
+    assert capsys.readouterr().out == "rm\nrun\n"
+
+
+@pytest.mark.parametrize("shell", ("bash", "zsh", "fish"))
+def test_should_script_refer_to_index(shell):
+    script = completion.script(shell, "my-app", "/tmp/index.json")
+    assert "my-app" in script
+    assert "/tmp/index.json" in script
+
+
+def test_should_script_raise_error_for_unknown_shell():
+    with pytest.raises(ValueError):
+        completion.script("cmd", "my-app", "/tmp/index.json")
+
+
+@pytest.mark.parametrize(
+    "shell, expected",
+    (
+        ("bash", "'/tmp/my index'\"'\"'s.json'"),
+        ("zsh", "'/tmp/my index'\"'\"'s.json'"),
+        ("fish", "'/tmp/my index\\'s.json'"),
+    )
+)
+def test_should_script_quote_paths(shell, expected):
+    script = completion.script(shell, "my-app", "/tmp/my index's.json")
+    assert expected in script
+
+
+@pytest.mark.skipif(
+    not os.path.exists("/bin/bash"), reason="bash is not installed"
+)
+def test_should_bash_script_complete_with_paths_of_spaces(index, tmpdir):
+    path = tmpdir.mkdir("my index").join("index.json")
+    path.write(json.dumps(index))
+    script = completion.script("bash", "my-app", str(path))
+    output = subprocess.check_output([
+        "/bin/bash", "-c",
+        script + 'COMP_WORDS=(my-app docker r); COMP_CWORD=2; '
+        '_cmdtree_complete_my_app; printf "%s\\n" "${COMPREPLY[@]}"'
+    ])
+    assert output.decode().split() == ["rm", "run"]
@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+import six
+
+from cmdtree import types
+from cmdtree.infer import infer_params
+
+
+def sample(disk_id, size=1, dry_run=False, name="", _private=None):
+    pass
+
+
+def test_infer_params_from_defaults():
+    assert infer_params(sample) == [
+        ("argument", "disk_id", {"type": None}),
+        ("option", "size", {"type": types.INT, "default": 1}),
+        ("option", "dry-run", {"is_flag": True}),
+        ("option", "name", {"type": None, "default": ""}),
+    ]
+
+
+def test_infer_params_should_be_cached():
+    assert infer_params(sample) == infer_params(sample)
+    from cmdtree import infer
+    assert sample in infer._cache
+
+
+@pytest.mark.skipif(six.PY2, reason="annotations are python 3 only")
+def test_infer_params_from_annotations():
+    namespace = {}
+    exec(
+        "from typing import List, Optional\n"
+        "def annotated(ids: List[int], key: uuid.UUID, *args,\n"
+        "              ratio: Optional[float] = None,\n"
+        "              cached: bool = True,\n"
+        "              color: types.Choices(['red']) = 'red', **kwargs):\n"
+        "    pass\n",
+        {"uuid": uuid, "types": types},
+        namespace,
+    )
+    calls = infer_params(namespace['annotated'])
+    assert [(method, name) for method, name, _ in calls] == [
+        ("argument", "ids"),
+        ("argument", "key"),
+        ("option", "ratio"),
+        ("option", "cached"),
+        ("option", "color"),
+    ]
+    assert calls[0][2] == {"type": types.INT, "nargs": "+"}
+    assert calls[1][2] == {"type": types.UUID}
+    assert calls[2][2] == {"type": types.FLOAT, "default": None}
+    assert calls[3][2] == {"type": types.BOOL, "default": True}
+    assert isinstance(calls[4][2]['type'], types.Choices)
@@ -0,0 +1,39 @@
+import pytest
+
+from cmdtree import lazy
+
+
+def test_should_import_ref_get_object():
+    assert lazy.import_ref("os.path:join") is __import__("os").path.join
+
+
+@pytest.mark.parametrize(
+    "ref",
+    (
+        "os.path",
+        ":join",
+        "os.path:",
+    )
+)
+def test_should_import_ref_raise_error_for_bad_ref(ref):
+    with pytest.raises(ValueError):
+        lazy.import_ref(ref)
+
+
+def test_should_get_ref_of_module_function():
+    assert lazy.get_ref(lazy.import_ref) == "cmdtree.lazy:import_ref"
+    assert lazy.get_ref(lazy.LazyFunc("os:getcwd")) == "os:getcwd"
+
+
+def test_should_get_ref_raise_error_for_local_function():
+    def func():
+        pass
+    with pytest.raises(ValueError):
+        lazy.get_ref(func)
+
+
+def test_should_lazy_func_import_on_call():
+    func = lazy.LazyFunc("os.path:join")
+    assert not func.resolved
+    assert func("a", "b") == __import__("os").path.join("a", "b")
+    assert func.resolved
@@ -0,0 +1,78 @@
+import errno
+import io
+
+import mock
+import pytest
+
+from cmdtree import output
+
+
+def rows():
+    yield {"name": "a", "size": 1}
+    yield {"name": "b,c", "size": 2}
+
+
+@pytest.mark.parametrize(
+    "format, expected",
+    (
+        ("lines", b"{'name': 'a', 'size': 1}\n{'name': 'b,c', 'size': 2}\n"),
+        ("jsonl", b'{"name":"a","size":1}\n{"name":"b,c","size":2}\n'),
+        ("csv", b'name,size\na,1\n"b,c",2\n'),
+        ("tsv", b"name\tsize\na\t1\nb,c\t2\n"),
+    )
+)
+def test_should_write_rows_in_format(format, expected):
+    out = io.BytesIO()
+    assert output.write_rows(rows(), format, out=out) == 2
+    assert out.getvalue() == expected
+
+
+def test_should_write_scalar_and_sequence_rows_as_csv():
+    out = io.BytesIO()
+    output.write_rows([1, "a b", (2, None)], "csv", out=out)
+    assert out.getvalue() == b'1\na b\n2,\n'
+
+
+def test_should_write_in_chunks():
+    out = mock.Mock()
+    output.write_rows(
+        (str(i) for i in range(10000)), out=out, chunk_size=8192
+    )
+    chunks = [call[0][0] for call in out.write.call_args_list]
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 8192 for chunk in chunks[:-1])
+    assert b"".join(chunks) == b"".join(
+        str(i).encode() + b"\n" for i in range(10000)
+    )
+
+
+def test_should_stop_when_reader_is_gone():
+    pulled = []
+
+    def numbers():
+        for i in range(100000):
+            pulled.append(i)
+            yield i
+
+    out = mock.Mock()
+    out.write.side_effect = IOError(errno.EPIPE, "Broken pipe")
+    generator = numbers()
+    assert output.write_rows(generator, out=out, chunk_size=10) is None
+    assert len(pulled) < 100000
+    with pytest.raises(StopIteration):
+        next(generator)
+
+
+@pytest.mark.parametrize(
+    "result, expected",
+    (
+        ([1], True),
+        (iter(()), True),
+        ("text", False),
+        (b"data", False),
+        ({"a": 1}, False),
+        (1, False),
+    )
+)
+def test_is_rows(result, expected):
+    assert output.is_rows(result) is expected
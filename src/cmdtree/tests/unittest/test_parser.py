@@ -3,7 +3,7 @@ import pytest
 import six
 
 from cmdtree import parser
-from cmdtree.exceptions import ArgumentParseError
+from cmdtree.exceptions import ArgumentParseError, MapError
 
 
 def mk_obj(property_dict):
@@ -195,3 +195,346 @@ class TestAParser:
             if type_func is not None:
                 assert type_func.called
             mocked_add.assert_called_with("--name", **kwargs)
+
+
+class TestLazyAParser:
+    def test_should_not_build_parser_until_dispatch(self, aparser, test_func):
+        lazy_parser = aparser.add_cmd("test", func=test_func, lazy=True)
+        assert not lazy_parser.materialized
+        assert aparser.run(["test"]) == "result"
+        assert lazy_parser.materialized
+
+    def test_should_replay_recorded_arguments(self, aparser):
+        lazy_parser = aparser.add_cmd(
+            "test", func=lambda name, port: (name, port), lazy=True
+        )
+        lazy_parser.argument("name")
+        lazy_parser.option("port", default=80)
+        assert not lazy_parser.materialized
+        assert aparser.run(["test", "hello"]) == ("hello", 80)
+
+    def test_should_forward_calls_after_materialized(self, aparser):
+        lazy_parser = aparser.add_cmd(
+            "test", func=lambda name: name, lazy=True
+        )
+        lazy_parser.materialize()
+        lazy_parser.argument("name")
+        assert aparser.run(["test", "hello"]) == "hello"
+
+    def test_should_only_build_dispatched_path(self, aparser, test_func):
+        parent = aparser.add_cmd("parent", lazy=True)
+        child = parent.add_cmd("child", func=test_func)
+        other = parent.add_cmd("other", func=test_func)
+        assert aparser.run(["parent", "child"]) == "result"
+        assert parent.materialized and child.materialized
+        assert not other.materialized
+
+    def test_should_list_lazy_commands_in_help(self, aparser, test_func):
+        lazy_parser = aparser.add_cmd(
+            "test", help="test help", func=test_func, lazy=True
+        )
+        help_msg = aparser.format_help()
+        assert "test help" in help_msg
+        assert not lazy_parser.materialized
+
+    def test_should_argument_check_name_eagerly(self, aparser):
+        lazy_parser = aparser.add_cmd("test", lazy=True)
+        with pytest.raises(ValueError):
+            lazy_parser.argument("--name")
+
+
+@pytest.mark.parametrize(
+    "exception, expected_status",
+    (
+        (SystemExit(None), 0),
+        (SystemExit(2), 2),
+        (SystemExit("message"), 1),
+        (ArgumentParseError("message"), 2),
+        (RuntimeError("message"), 1),
+    )
+)
+def test_call_for_status_convert_exception(exception, expected_status):
+    def run(args):
+        raise exception
+    assert parser.call_for_status(run, [])[0] == expected_status
+
+
+def test_run_many_should_not_stop_at_failed_args(aparser):
+    cmd = aparser.add_cmd("echo", func=lambda value: value)
+    cmd.argument("value")
+    results = list(aparser.run_many([["echo", "1"], ["fake"], ["echo", "2"]]))
+    assert [status for status, _ in results] == [0, 2, 0]
+    assert results[0][1] == "1"
+    assert results[2][1] == "2"
+
+
+def double(prefix, value):
+    if value == "bad":
+        raise ValueError(value)
+    return prefix + value * 2
+
+
+class TestMappableArgument:
+    @pytest.fixture()
+    def map_parser(self, aparser):
+        cmd = aparser.add_cmd("double", func=double)
+        cmd.option("prefix", default="")
+        cmd.argument("value", nargs="+", map=True)
+        return aparser
+
+    @pytest.mark.parametrize("jobs", ("1", "2"))
+    def test_should_call_for_each_value_in_order(self, map_parser, jobs):
+        assert map_parser.run(
+            ["double", "a", "b", "c", "--prefix", "-", "--jobs", jobs]
+        ) == ["-aa", "-bb", "-cc"]
+
+    @pytest.mark.parametrize(
+        "silent_exit, exception",
+        (
+            (False, MapError),
+            (True, SystemExit),
+        )
+    )
+    def test_should_aggregate_failures(
+            self, map_parser, silent_exit, exception, capsys
+    ):
+        from cmdtree.registry import env
+        env.silent_exit = silent_exit
+        with pytest.raises(exception) as excinfo:
+            map_parser.run(["double", "a", "bad", "c", "--jobs", "2"])
+        env.silent_exit = True
+        if exception is MapError:
+            assert excinfo.value.results == ["aa", None, "cc"]
+            assert [value for value, _ in excinfo.value.failures] == ["bad"]
+        else:
+            assert excinfo.value.code == 1
+        assert "1 of 3 items failed" in capsys.readouterr().err
+
+    def test_should_map_require_nargs(self, aparser):
+        with pytest.raises(ValueError):
+            aparser.argument("value", map=True)
+
+
+def total(values):
+    return sum(values)
+
+
+class TestArgfileArgument:
+    @pytest.fixture()
+    def sum_parser(self, aparser):
+        from cmdtree.types import INT
+        cmd = aparser.add_cmd("total", func=total)
+        cmd.argument("values", type=INT, nargs="+", argfile=True)
+        return aparser
+
+    @pytest.fixture()
+    def argfile(self, tmpdir):
+        path = tmpdir.join("values.txt")
+        path.write_binary(b"1\r\n2\n\n3")
+        return str(path)
+
+    def test_should_read_values_from_file(self, sum_parser, argfile):
+        assert sum_parser.run(["total", "10", "@" + argfile, "20"]) == 36
+
+    def test_should_read_values_from_stdin(
+            self, sum_parser, argfile, monkeypatch
+    ):
+        import io
+        monkeypatch.setattr(
+            "sys.stdin", io.TextIOWrapper(io.BytesIO(b"4\n5\n"))
+        )
+        assert sum_parser.run(["total", "@-", "@" + argfile]) == 15
+
+    def test_should_pass_generator(self, aparser, argfile):
+        import types
+        cmd = aparser.add_cmd("values", func=lambda values: values)
+        cmd.argument("values", nargs="*", argfile=True)
+        values = aparser.run(["values", "@" + argfile, "@@x"])
+        assert isinstance(values, types.GeneratorType)
+        assert list(values) == ["1", "2", "3", "@x"]
+
+    def test_should_fail_on_missing_file(self, sum_parser, tmpdir):
+        result = parser.invoke(
+            sum_parser, ["total", "@" + str(tmpdir.join("missing"))]
+        )
+        assert result.status == 2
+        assert "can't open" in str(result.error)
+
+    def test_should_fail_on_bad_value_when_pulled(self, sum_parser, tmpdir):
+        path = tmpdir.join("values.txt")
+        path.write_binary(b"1\nx\n")
+        result = parser.invoke(sum_parser, ["total", "@" + str(path)])
+        assert result.status == 2
+        assert result.token == "x"
+        assert "x is not a valid integer" in str(result.error)
+
+    def test_should_argfile_require_nargs(self, aparser):
+        with pytest.raises(ValueError):
+            aparser.argument("value", argfile=True)
+
+
+def count(n):
+    return ({"n": i} for i in range(int(n)))
+
+
+class TestOutputOption:
+    @pytest.fixture()
+    def out_parser(self, aparser):
+        aparser.add_cmd("before", func=count).argument("n")
+        aparser.add_output_option()
+        aparser.add_cmd("group").add_cmd("after", func=count).argument("n")
+        return aparser
+
+    @pytest.mark.parametrize(
+        "args, expected",
+        (
+            (["before", "2"], b"{'n': 0}\n{'n': 1}\n"),
+            (["--output", "jsonl", "before", "1"], b'{"n":0}\n'),
+            (["group", "after", "1", "--output", "csv"], b"n\n0\n"),
+            (["group", "--output", "tsv", "after", "1"], b"n\n0\n"),
+        )
+    )
+    def test_should_write_rows(self, out_parser, args, expected, capfdbinary):
+        assert out_parser.run(args) is None
+        assert capfdbinary.readouterr().out == expected
+
+    def test_should_return_other_results(self, aparser):
+        aparser.add_output_option()
+        aparser.add_cmd("echo", func=lambda value: value).argument("value")
+        assert aparser.run(["echo", "x"]) == "x"
+
+    def test_should_resolve_through_parser_with_output(self, capfdbinary):
+        from cmdtree.tree import CmdTree
+        tree = CmdTree()
+        tree.root.add_output_option("jsonl")
+        tree.add_commands(["count"], count).argument("n")
+        assert not tree.root.has_arguments()
+        assert tree.resolve(["count", "1"])[0] is \
+            tree.get_cmd_by_path(["count"]).cmd
+        tree.dispatch(["count", "1"])
+        assert capfdbinary.readouterr().out == b'{"n":0}\n'
+
+    def test_should_invoke_return_rows(self, out_parser):
+        result = parser.invoke(out_parser, ["before", "2"])
+        assert list(result.value) == [{"n": 0}, {"n": 1}]
+
+    def test_should_show_output_in_help(self, out_parser):
+        help = out_parser.add_cmd("later", func=count).format_help()
+        assert "--output {csv,jsonl,lines,tsv}" in help
+
+
+def test_run_should_close_resources_after_command(aparser, tmpdir):
+    from cmdtree.types import MMapFile
+    path = tmpdir.join("data.bin")
+    path.write_binary(b"data")
+    aparser.add_cmd("head", func=lambda data: (data, data[:2])).argument(
+        "data", type=MMapFile()
+    )
+    mapped, head = aparser.run(["head", str(path)])
+    assert head == b"da"
+    # python 2 map has no closed
+    with pytest.raises(ValueError):
+        mapped[0]
+    mapped, head = parser.invoke(aparser, ["head", str(path)]).value
+    with pytest.raises(ValueError):
+        mapped[0]
+
+
+class TestHelp:
+    @pytest.fixture()
+    def group(self, aparser):
+        aparser.option("verbose", help="show more " * 10, is_flag=True)
+        for index in range(20):
+            aparser.add_cmd(
+                "cmd" + "x" * index,
+                help="help of command %d " % index * 5,
+                lazy=index % 2 == 0,
+            )
+        return aparser
+
+    def test_should_cache_help_until_parser_changed(self, group):
+        with mock.patch.object(
+                group, "_get_formatter", wraps=group._get_formatter
+        ) as get_formatter:
+            text = group.format_help()
+            assert group.format_help() is text
+            assert group.format_usage() == group.format_usage()
+            assert get_formatter.call_count == 2
+            group.add_cmd("new", lazy=True)
+            assert "new" in group.format_help()
+            group.option("debug")
+            assert "--debug" in group.format_help()
+            assert "--debug" in group.format_usage()
+
+    def test_should_iter_help_render_same_message(self, group):
+        from argparse import ArgumentParser
+        chunks = list(group.iter_help())
+        assert len(chunks) == 22
+        assert "".join(chunks) == ArgumentParser.format_help(group)
+        assert list(group.iter_help()) == ["".join(chunks)]
+
+    def test_should_print_help_by_chunks(self, group):
+        out = six.StringIO()
+        group.print_help(out)
+        assert out.getvalue() == group.format_help()
+
+
+def show_disk(disk_id, dry_run=False, *args, **kwargs):
+    return disk_id
+
+
+class TestKwargsMap:
+    @pytest.fixture()
+    def leaf(self, aparser):
+        aparser.argument("host")
+        group = aparser.add_cmd("disks")
+        group.option("dry-run", is_flag=True)
+        leaf = group.add_cmd(
+            "show",
+            func=lambda host, disk_id, dry_run: (host, disk_id, dry_run),
+        )
+        leaf.argument("disk_id")
+        return leaf
+
+    def test_should_map_dests_of_command_path(self, aparser, leaf):
+        assert sorted(leaf.get_kwargs_map()) == [
+            ("disk_id", "disk_id"), ("dry_run", "dry_run"), ("host", "host"),
+        ]
+        assert aparser.run(["h", "disks", "--dry-run", "show", "1"]) == (
+            "h", "1", True
+        )
+
+    def test_should_reject_argument_not_in_function(self, leaf):
+        with pytest.raises(ValueError):
+            leaf.option("verbose", is_flag=True)
+
+    def test_should_reject_function_missing_argument(self, aparser):
+        aparser.add_cmd("show", func=lambda disk_id, size: disk_id).argument(
+            "disk_id"
+        )
+        with pytest.raises(ValueError) as excinfo:
+            aparser.run(["show", "1"])
+        assert "missing: ['size']" in str(excinfo.value)
+
+    def test_should_not_import_lazy_function(self, aparser):
+        from cmdtree.lazy import LazyFunc
+        func = LazyFunc("os.path:basename")
+        aparser.add_cmd("name", func=func).argument("path")
+        assert aparser.add_cmd("fake", func=func).option("x") is not None
+        assert not func.resolved
+
+    @pytest.mark.parametrize(
+        "func, expected",
+        (
+            (show_disk, None),
+            (lambda a, b=1: None, (set(["a", "b"]), set(["a"]))),
+            (TestAParser().test_should_execute_child_cmd,
+             (set(["aparser", "test_func"]), set(["aparser", "test_func"]))),
+        )
+    )
+    def test_get_params(self, func, expected):
+        params = parser._get_params(func)
+        if expected is None:
+            assert params is None
+        else:
+            assert (set(params[0]), set(params[1])) == expected
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from cmdtree import paths
+
+
+@pytest.fixture()
+def root(tmpdir):
+    for name in (
+            "a.py", "b.txt", "src/c.py", "src/pkg/d.py", "src/pkg/e.txt",
+            ".git/f.py",
+    ):
+        tmpdir.join(name).ensure()
+    return tmpdir
+
+
+def relpaths(entries, root):
+    return sorted(
+        os.path.relpath(entry.path, str(root)).replace(os.sep, "/")
+        for entry in entries
+    )
+
+
+@pytest.mark.parametrize(
+    "pattern, names, expected",
+    (
+        ("*.py", ("a.py", ), True),
+        ("*.py", ("src", "c.py"), False),
+        ("src/*.py", ("src", "c.py"), True),
+        ("**/*.py", ("a.py", ), True),
+        ("**/*.py", ("src", "pkg", "d.py"), True),
+        ("src/**", ("src", "pkg"), True),
+        ("s*/p*/*.txt", ("src", "pkg", "e.txt"), True),
+        ("s*/p*/*.txt", ("src", "e.txt"), False),
+    )
+)
+def test_pattern_should_match_by_components(pattern, names, expected):
+    assert paths.PathPattern(pattern).match(names) is expected
+
+
+def test_pattern_should_prune_directories():
+    pattern = paths.PathPattern("src/*/*.py")
+    assert pattern.can_contain(("src", ))
+    assert pattern.can_contain(("src", "pkg"))
+    assert not pattern.can_contain(("lib", ))
+    assert not pattern.can_contain(("src", "pkg", "sub"))
+    assert paths.PathPattern("src/**/*.py").can_contain(("src", "a", "b"))
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    (
+        ("*.py", (os.curdir, "*.py")),
+        ("src/**/*.py", ("src", "**/*.py")),
+        ("/var/log/*.gz", ("/var/log", "*.gz")),
+        ("/*.gz", ("/", "*.gz")),
+    )
+)
+def test_split_pattern(pattern, expected):
+    assert paths.split_pattern(pattern) == expected
+
+
+class TestIterPaths:
+    def test_should_list_directory(self, root):
+        assert relpaths(paths.iter_paths(str(root)), root) == \
+            [".git", "a.py", "b.txt", "src"]
+
+    def test_should_walk_directory_recursively(self, root):
+        entries = paths.iter_paths(
+            str(root), recursive=True, kind="file", exclude=[".git"],
+        )
+        assert relpaths(entries, root) == [
+            "a.py", "b.txt", "src/c.py", "src/pkg/d.py", "src/pkg/e.txt",
+        ]
+
+    def test_should_filter_by_include(self, root):
+        entries = paths.iter_paths(
+            str(root), recursive=True, include=["*.txt", "pkg"],
+        )
+        assert relpaths(entries, root) == ["b.txt", "src/pkg", "src/pkg/e.txt"]
+
+    def test_should_match_glob(self, root):
+        entries = paths.iter_paths(str(root.join("**", "*.py")))
+        assert relpaths(entries, root) == [
+            ".git/f.py", "a.py", "src/c.py", "src/pkg/d.py",
+        ]
+        entries = paths.iter_paths(str(root.join("src", "*", "*.txt")))
+        assert relpaths(entries, root) == ["src/pkg/e.txt"]
+
+    def test_should_yield_given_file(self, root):
+        entry, = paths.iter_paths(str(root.join("a.py")))
+        assert isinstance(entry, paths.PathEntry)
+        assert entry.name == "a.py"
+        assert entry.is_file() and not entry.is_dir()
+        assert entry.stat() is entry.stat()
+
+    def test_should_yield_nothing_for_missing_base(self, root):
+        assert list(paths.iter_paths(str(root.join("missing", "*")))) == []
+
+    @pytest.mark.skipif(
+        not hasattr(os, "scandir"), reason="os.scandir is missing"
+    )
+    def test_should_close_directories_when_closed(self, root, monkeypatch):
+        opened = []
+        scandir = os.scandir
+
+        def tracked(path):
+            iterator = scandir(path)
+            opened.append(iterator)
+            return iterator
+
+        monkeypatch.setattr(os, "scandir", tracked)
+        entries = paths.iter_paths(str(root), recursive=True)
+        for entry in entries:
+            if entry.name == "pkg":
+                break
+        entries.close()
+        assert len(opened) > 1
+        assert all(
+            next(iterator, None) is None for iterator in opened
+        )
+
+
+def test_should_resolve_path_against_base_dir():
+    assert paths.resolve_path("data.txt") == "data.txt"
+    with paths.base_dir("/client"):
+        assert paths.resolve_path("data.txt") == os.path.join(
+            "/client", "data.txt"
+        )
+        assert paths.resolve_path("/tmp/data.txt") == "/tmp/data.txt"
+        assert paths.resolve_path("-") == "-"
+    assert paths.resolve_path("data.txt") == "data.txt"
@@ -1,7 +1,101 @@
+import pytest
+import six
+
+
 def test_get_tree_always_get_the_same_one():
     from cmdtree.registry import env
     from cmdtree.tree import CmdTree
     tree1 = env.tree
     tree2 = env.tree
     assert isinstance(tree1, CmdTree)
-    assert tree1 is tree2
\ No newline at end of file
+    assert tree1 is tree2
+
+@pytest.fixture()
+def batch_env():
+    from cmdtree.registry import ENV
+    batch_env = ENV()
+    cmd = batch_env.tree.add_commands(["echo"], lambda value: value)
+    cmd.argument("value")
+    batch_env.tree.add_commands(["nothing"], lambda: None)
+    return batch_env
+
+
+@pytest.mark.parametrize(
+    "source, sep",
+    (
+        (b"echo 1\n\necho 'hello world'\nnothing\n", "\n"),
+        (b"echo 1\0echo 'hello world'\0nothing", "\0"),
+    )
+)
+def test_entry_batch_should_write_results(batch_env, source, sep):
+    out = six.StringIO()
+    status = batch_env.entry_batch(six.BytesIO(source), sep=sep, out=out)
+    assert status == 0
+    assert out.getvalue() == "1\nhello world\n"
+
+
+def test_entry_batch_should_report_failed_invocation(batch_env, capsys):
+    out = six.StringIO()
+    status = batch_env.entry_batch(
+        six.BytesIO(b"echo 1\nfake\necho 'unclosed\necho 2\n"), out=out
+    )
+    assert status == 1
+    assert out.getvalue() == "1\n2\n"
+    err = capsys.readouterr().err
+    assert "invocation #2 `fake` failed with status 2" in err
+    assert "invocation #3" in err
+
+
+def test_entry_batch_should_read_file(batch_env, tmpdir):
+    source = tmpdir.join("batch")
+    source.write("echo 1\n")
+    out = six.StringIO()
+    assert batch_env.entry_batch(str(source), out=out) == 0
+    assert out.getvalue() == "1\n"
+
+
+def test_settings_should_only_change_current_context(batch_env):
+    import threading
+    from cmdtree.exceptions import ArgumentParseError
+    results = []
+
+    def run_fake():
+        try:
+            batch_env.entry(["fake"])
+        except SystemExit:
+            results.append("exit")
+
+    with batch_env.settings(silent_exit=False):
+        thread = threading.Thread(target=run_fake)
+        thread.start()
+        thread.join()
+        with pytest.raises(ArgumentParseError):
+            batch_env.entry(["fake"])
+    assert results == ["exit"]
+    assert batch_env.silent_exit
+    with pytest.raises(TypeError):
+        with batch_env.settings(fake=True):
+            pass
+
+
+def test_activate_should_register_commands_to_env():
+    from cmdtree import command
+    from cmdtree.registry import ENV, current_env, env
+    other = ENV()
+    with other.activate():
+        assert current_env() is other
+
+        @command("only-in-other")
+        def hello():
+            return "hello"
+    assert current_env() is env
+    assert other.entry(["only-in-other"]) == "hello"
+    assert ("only-in-other", ) not in env.tree.nodes
+
+
+def test_env_should_accept_tree():
+    from cmdtree.registry import ENV
+    from cmdtree.tree import CmdTree
+    tree = CmdTree()
+    tree.add_commands(["hello"], lambda: "hello")
+    assert ENV(tree=tree).entry(["hello"]) == "hello"
@@ -0,0 +1,41 @@
+import pytest
+
+from cmdtree import resources
+
+
+def test_should_close_in_reverse_order_when_scope_exits():
+    closed = []
+    with resources.scope():
+        assert resources.register(lambda: closed.append(1))
+        assert resources.register(lambda: closed.append(2))
+        assert closed == []
+    assert closed == [2, 1]
+
+
+def test_should_not_register_out_of_scope():
+    assert not resources.register(lambda: None)
+
+
+def test_should_keep_outer_resources_until_outer_scope_exits():
+    closed = []
+    with resources.scope():
+        resources.register(lambda: closed.append("outer"))
+        with resources.scope():
+            resources.register(lambda: closed.append("inner"))
+        assert closed == ["inner"]
+    assert closed == ["inner", "outer"]
+
+
+def test_should_close_all_and_raise_first_error():
+    closed = []
+
+    def fail(message):
+        raise ValueError(message)
+
+    with pytest.raises(ValueError) as excinfo:
+        with resources.scope():
+            resources.register(lambda: closed.append(1))
+            resources.register(lambda: fail("first"))
+            resources.register(lambda: fail("second"))
+    assert str(excinfo.value) == "second"
+    assert closed == [1]
@@ -204,7 +204,8 @@ class TestGroup:
             mocked_mk.assert_called_with(
                 "name",
                 help=None,
-                path_prefix=("do_nothing", )
+                path_prefix=("do_nothing", ),
+                infer=False,
             )
 
     def test_should_group_call_mk_group(self, group):
@@ -215,7 +216,8 @@ class TestGroup:
             mocked_mk.assert_called_with(
                 "name",
                 help=None,
-                path_prefix=("do_nothing", )
+                path_prefix=("do_nothing", ),
+                infer=False,
             )
 
 
@@ -228,4 +230,58 @@ class TestCmd:
 
 
 def test_get_func_name(do_nothing):
-    assert shortcuts._get_func_name(do_nothing) == "func"
\ No newline at end of file
+    assert shortcuts._get_func_name(do_nothing) == "func"
+
+def test_should_mk_cmd_accept_lazy_reference():
+    from cmdtree.lazy import LazyFunc
+    cmd = shortcuts._mk_cmd(None)("os.path:join")
+    assert isinstance(cmd.func, LazyFunc)
+    assert cmd.meta.name == "join"
+    assert not cmd.func.resolved
+
+
+def test_get_func_name_of_lazy_reference():
+    from cmdtree.lazy import LazyFunc
+    assert shortcuts._get_func_name(LazyFunc("pkg.disks:Disk.delete")) == \
+        "delete"
+
+
+def serve(host, port=8000, reload=False):
+    return host, port, reload
+
+
+class TestInfer:
+    @pytest.fixture()
+    def other_env(self):
+        from cmdtree.registry import ENV
+        other_env = ENV()
+        with other_env.activate():
+            yield other_env
+
+    def test_should_command_infer_arguments(self, other_env):
+        from cmdtree.shortcuts import command
+        cmd = command(infer=True)(serve)
+        assert cmd.inferred == set(["host", "port", "reload"])
+        assert other_env.entry(["serve", "h", "--port", "80", "--reload"]) \
+            == ("h", 80, True)
+
+    def test_should_declared_params_take_place_of_inferred(self, other_env):
+        from cmdtree.shortcuts import argument, command, option
+        from cmdtree.types import INT
+        cmd = command(infer=True)(
+            argument("port", type=INT)(serve)
+        )
+        assert cmd.inferred == set(["host", "reload"])
+        assert other_env.entry(["serve", "h", "80"]) == ("h", 80, False)
+        with pytest.raises(ValueError):
+            option("reload", is_flag=True)(cmd)
+
+    def test_should_group_infer_arguments(self, other_env):
+        from cmdtree.shortcuts import group
+
+        def computer(host):
+            pass
+
+        computer_group = group(infer=True)(computer)
+        computer_group.command()(lambda host: host)
+        assert other_env.entry(["computer", "h", "<lambda>"]) == "h"
@@ -0,0 +1,186 @@
+import os
+import sys
+
+import pytest
+
+from cmdtree import snapshot
+from cmdtree.lazy import LazyFunc
+from cmdtree.tree import CmdTree
+from cmdtree.types import INT, LazyFile
+
+
+def show(ip, disk_id, verbose):
+    return ip, disk_id, verbose
+
+
+@pytest.fixture()
+def lazy_tree():
+    tree = CmdTree(lazy=True)
+    tree.add_parent_commands(["computer"], help="computer")['cmd'].argument(
+        "ip"
+    )
+    parser = tree.add_commands(["computer", "show"], show, help="show disk")
+    parser.argument("disk_id", type=INT)
+    parser.option("verbose", is_flag=True)
+    return tree
+
+
+@pytest.fixture()
+def snapshot_path(tmpdir):
+    return str(tmpdir.join("tree.snapshot"))
+
+
+def test_should_load_dumped_tree(lazy_tree, snapshot_path):
+    snapshot.dump(lazy_tree, snapshot_path)
+    tree = snapshot.load(snapshot_path)
+    func = tree.get_cmd_by_path(["computer", "show"])['cmd'].func
+    assert isinstance(func, LazyFunc)
+    assert not func.resolved
+    args = ["computer", "localhost", "show", "1", "--verbose"]
+    assert tree.dispatch(args) == lazy_tree.dispatch(args)
+    assert "show disk" in tree.get_cmd_by_path(
+        ["computer"]
+    )['cmd'].format_help()
+
+
+def test_should_load_only_nodes_on_dispatched_path(lazy_tree, snapshot_path):
+    lazy_tree.add_commands(["disks", "list"], show, help="list disks")
+    snapshot.dump(lazy_tree, snapshot_path)
+    tree = snapshot.load(snapshot_path)
+    assert ("computer", ) in tree.nodes
+    assert ("computer", "show") not in tree.nodes
+    assert ("disks", "list") not in tree.nodes
+    args = ["computer", "localhost", "show", "1"]
+    assert tree.dispatch(args) == ("localhost", 1, False)
+    assert ("computer", "show") in tree.nodes
+    assert ("disks", "list") not in tree.nodes
+    assert snapshot.load(snapshot_path).root.run(args) == (
+        "localhost", 1, False
+    )
+
+
+def test_should_load_return_none_if_snapshot_missing(snapshot_path):
+    assert snapshot.load(snapshot_path) is None
+
+
+def test_should_load_return_none_if_source_changed(
+        lazy_tree, snapshot_path, tmpdir
+):
+    source = tmpdir.join("commands.py")
+    source.write("")
+    snapshot.dump(lazy_tree, snapshot_path, sources=[str(source)])
+    assert snapshot.load(snapshot_path) is not None
+    source.write("# changed")
+    assert snapshot.load(snapshot_path) is None
+
+
+def test_should_dump_raise_error_for_eager_tree(snapshot_path):
+    tree = CmdTree()
+    tree.add_commands(["show"], show)
+    with pytest.raises(ValueError):
+        snapshot.dump(tree, snapshot_path)
+    assert not os.path.exists(snapshot_path)
+
+
+def test_should_load_or_build_only_build_once(lazy_tree, snapshot_path):
+    built = []
+
+    def build():
+        built.append(True)
+        return lazy_tree
+
+    snapshot.load_or_build(snapshot_path, build)
+    snapshot.load_or_build(snapshot_path, build)
+    assert len(built) == 1
+
+
+def test_should_load_or_build_rebuild_if_registering_module_changed(
+        snapshot_path, tmpdir, monkeypatch
+):
+    package = tmpdir.mkdir("snapshot_app")
+    package.join("__init__.py").write("")
+    package.join("impl.py").write("def show():\n    return 'show'\n")
+    cli = package.join("cli.py")
+    cli.write(
+        "from cmdtree.lazy import LazyFunc\n"
+        "from cmdtree.tree import CmdTree\n"
+        "tree = CmdTree(lazy=True)\n"
+        "tree.add_commands(['show'], LazyFunc('snapshot_app.impl:show'))\n"
+    )
+    monkeypatch.syspath_prepend(str(tmpdir))
+    built = []
+
+    def build():
+        built.append(True)
+        for name in ("snapshot_app", "snapshot_app.cli"):
+            monkeypatch.delitem(sys.modules, name, raising=False)
+        from snapshot_app import cli
+        return cli.tree
+
+    assert snapshot.load_or_build(snapshot_path, build).dispatch(
+        ["show"]
+    ) == "show"
+    snapshot.load_or_build(snapshot_path, build)
+    assert len(built) == 1
+    cli.write("# help of show is changed\n" + cli.read())
+    snapshot.load_or_build(snapshot_path, build)
+    assert len(built) == 2
+    monkeypatch.delitem(sys.modules, "snapshot_app.impl", raising=False)
+
+
+def test_should_print_saved_help_without_building_parsers(
+        lazy_tree, snapshot_path, capsys
+):
+    lazy_tree.add_commands(["disks", "list"], show, help="list disks")
+    parser = lazy_tree.get_cmd_by_path(["disks", "list"])['cmd']
+    expected = parser.format_help()
+    snapshot.dump(lazy_tree, snapshot_path)
+    tree = snapshot.load(snapshot_path)
+    with pytest.raises(SystemExit):
+        tree.dispatch(["disks", "list", "--help"])
+    assert capsys.readouterr()[0] == expected
+    assert not tree.get_cmd_by_path(["disks"])['cmd'].materialized
+    assert not tree.get_cmd_by_path(["disks", "list"])['cmd'].materialized
+
+
+def test_should_not_use_saved_help_of_other_prog(
+        lazy_tree, snapshot_path, monkeypatch
+):
+    snapshot.dump(lazy_tree, snapshot_path)
+    monkeypatch.setattr("sys.argv", ["other-prog"])
+    tree = snapshot.load(snapshot_path)
+    parser = tree.get_cmd_by_path(["computer"])['cmd']
+    assert parser.rendered_help is None
+    assert "other-prog computer" in parser.format_help()
+
+
+def start(host, port=8000):
+    return host, port
+
+
+def test_should_keep_inferred_arguments(snapshot_path):
+    from cmdtree.registry import ENV
+    from cmdtree.shortcuts import command
+    lazy_env = ENV(lazy=True)
+    with lazy_env.activate():
+        command(infer=True)(start)
+    snapshot.dump(lazy_env.tree, snapshot_path)
+    tree = snapshot.load(snapshot_path)
+    assert tree.dispatch(["start", "h", "--port", "80"]) == ("h", 80)
+
+
+def read_lines(lines):
+    return lines.read()
+
+
+def test_should_load_tree_with_lazy_file_argument(snapshot_path, tmpdir):
+    source = tmpdir.join("lines.txt")
+    source.write("a\nb\n")
+    tree = CmdTree(lazy=True)
+    tree.add_commands(["read"], read_lines).argument(
+        "lines", type=LazyFile(max_open=2)
+    )
+    assert tree.dispatch(["read", str(source)]) == "a\nb\n"
+    snapshot.dump(tree, snapshot_path)
+    loaded = snapshot.load(snapshot_path)
+    assert loaded.dispatch(["read", str(source)]) == "a\nb\n"
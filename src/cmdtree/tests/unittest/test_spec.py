@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from cmdtree import spec as spec_module
+
+
+def disk_show(disk_id, verbose):
+    return disk_id, verbose
+
+
+def echo(name):
+    return name
+
+
+SPEC = {
+    "prog": "computer",
+    "help": "manage the computer",
+    "commands": {
+        "disks": {
+            "help": "manage disks",
+            "commands": {
+                "show": {
+                    "func": __name__ + ":disk_show",
+                    "arguments": [{"name": "disk_id", "type": "int"}],
+                    "options": [{"name": "verbose", "is_flag": True}],
+                },
+            },
+        },
+        "path": {
+            "commands": {
+                "join": {
+                    "func": __name__ + ":echo",
+                    "arguments": [{
+                        "name": "name",
+                        "type": {"name": "choices", "choices": ["a", "b"]},
+                    }],
+                },
+            },
+        },
+    },
+}
+
+
+@pytest.fixture
+def tree():
+    return spec_module.load(SPEC)
+
+
+def test_should_load_add_nothing_but_root(tree):
+    assert list(tree.nodes) == [()]
+    assert not tree.root.materialized
+
+
+def test_should_dispatch_only_expand_branch_on_path(tree):
+    assert tree.dispatch(["disks", "show", "1", "--verbose"]) == (1, True)
+    assert ("disks", "show") in tree.nodes
+    assert tree.nodes[("path", )].expander is not None
+    assert not tree.nodes[("path", )].cmd.materialized
+
+
+def test_should_root_run_expand_branch(tree):
+    assert tree.root.run(["path", "join", "a"]) == "a"
+
+
+def test_should_validate_type_from_spec(tree):
+    from cmdtree.exceptions import ArgumentParseError
+    from cmdtree.registry import env
+    env.silent_exit = False
+    try:
+        with pytest.raises(ArgumentParseError):
+            tree.dispatch(["path", "join", "c"])
+    finally:
+        env.silent_exit = True
+
+
+def test_should_help_list_commands_of_branch(tree, capsys):
+    with pytest.raises(SystemExit):
+        tree.dispatch(["disks", "-h"])
+    assert "show" in capsys.readouterr()[0]
+
+
+def test_should_get_cmd_by_path_expand_nodes(tree):
+    node = tree.get_cmd_by_path(["disks", "show"])
+    assert node.path == ("disks", "show")
+
+
+def test_should_load_file_read_included_spec_on_demand(tmpdir):
+    tmpdir.join("disks.json").write(
+        json.dumps(SPEC['commands']['disks']['commands'])
+    )
+    spec_file = tmpdir.join("computer.json")
+    spec_file.write(
+        json.dumps({"commands": {"disks": {"commands": "disks.json"}}})
+    )
+    tree = spec_module.load_file(str(spec_file))
+    tmpdir.join("disks.json").rename(tmpdir.join("moved.json"))
+    with pytest.raises(IOError):
+        tree.dispatch(["disks", "show", "1"])
+    tmpdir.join("moved.json").rename(tmpdir.join("disks.json"))
+    tree = spec_module.load_file(str(spec_file))
+    assert tree.dispatch(["disks", "show", "1"]) == (1, False)
+
+
+@pytest.mark.parametrize(
+    "type_spec, value, expected",
+    (
+        ("int", "3", 3),
+        ({"name": "int_range", "min": 0, "max": 5, "clamp": True}, "7", 5),
+        ({"name": "choices", "choices": [1, 2], "type": "int"}, "2", 2),
+    )
+)
+def test_should_make_type_by_name(type_spec, value, expected):
+    convert = spec_module.make_type(type_spec)()['type']
+    assert convert(value) == expected
+
+
+@pytest.mark.parametrize(
+    "spec",
+    (
+        {"command": {}},
+        {"commands": {"bad": {"arguments": [{"name": "a", "type": "bad"}]}}},
+    )
+)
+def test_should_reject_bad_spec(spec):
+    with pytest.raises(ValueError):
+        spec_module.load(spec).get_cmd_by_path(["bad"])
+
+
+def test_should_make_records_type_with_converter(tmpdir):
+    path = tmpdir.join("ids")
+    path.write_binary(b"1\x002\x00")
+    param_type = spec_module.make_type(
+        {"name": "records", "sep": u"\u0000", "type": "int"}
+    )
+    assert list(param_type.convert(str(path))) == [1, 2]
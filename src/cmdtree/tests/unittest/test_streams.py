@@ -0,0 +1,44 @@
+import io
+import threading
+
+import pytest
+
+from cmdtree import streams
+
+
+@pytest.mark.parametrize("chunk_size", (1, 3, 1024))
+def test_iter_records_should_split_across_chunks(chunk_size):
+    stream = io.BytesIO(b"a\nbc\n\nd")
+    assert list(streams.iter_records(stream, chunk_size=chunk_size)) == \
+        [b"a", b"bc", b"", b"d"]
+
+
+def test_prefetch_should_keep_order():
+    assert list(streams.prefetch(iter(range(100)), 3)) == list(range(100))
+
+
+def test_prefetch_should_raise_error_of_iterable():
+    def fail():
+        yield 1
+        raise ValueError("bad")
+
+    items = streams.prefetch(fail(), 2)
+    assert next(items) == 1
+    with pytest.raises(ValueError):
+        next(items)
+
+
+def test_prefetch_should_close_iterable_when_consumer_stops():
+    closed = threading.Event()
+
+    def numbers():
+        try:
+            for i in range(10 ** 6):
+                yield i
+        finally:
+            closed.set()
+
+    items = streams.prefetch(numbers(), 2)
+    assert next(items) == 0
+    items.close()
+    assert closed.wait(5)
@@ -141,4 +141,203 @@ class TestCmdTree:
     def test_should_add_parent_cmd_not_repeat_add(self, cmd_tree_with_tree):
         orig_node = cmd_tree_with_tree.add_parent_commands(['test_nested', 'child'])
         new_node = cmd_tree_with_tree.add_parent_commands(['test_nested', 'child'])
-        assert id(orig_node['cmd']) == id(new_node['cmd'])
\ No newline at end of file
+        assert id(orig_node['cmd']) == id(new_node['cmd'])
+
+def test_lazy_tree_should_not_build_parsers_when_adding():
+    from cmdtree.parser import LazyAParser
+    from cmdtree.tree import CmdTree
+    tree = CmdTree(lazy=True)
+    parser = tree.add_commands(["computer", "show"], lambda: "show")
+    tree.add_commands(["computer", "list"], lambda: "list")
+    assert isinstance(parser, LazyAParser)
+    assert not tree.get_cmd_by_path(["computer"])['cmd'].materialized
+    assert tree.root.run(["computer", "show"]) == "show"
+    assert parser.materialized
+    assert not tree.get_cmd_by_path(["computer", "list"])['cmd'].materialized
+
+
+@pytest.fixture(params=(False, True))
+def docker_tree(request):
+    from cmdtree.tree import CmdTree
+    tree = CmdTree(lazy=request.param)
+    docker = tree.add_parent_commands(["docker"])['cmd']
+    docker.argument("ip")
+    run = tree.add_commands(
+        ["docker", "run"], lambda ip, name, port: (ip, name, port)
+    )
+    run.argument("name")
+    run.option("port", default=80)
+    tree.add_commands(
+        ["computer", "disks", "show"], lambda disk_id: disk_id
+    ).argument("disk_id")
+    tree.add_commands(["g", "echo"], lambda value: value).argument("value")
+    return tree
+
+
+class TestDispatch:
+    @pytest.mark.parametrize(
+        "args, expected_path",
+        (
+            (["computer", "disks", "show", "1"], ["computer", "disks", "show"]),
+            (["docker", "0.0.0.0", "run", "c1"], ["docker"]),
+            (["computer", "fake"], ["computer"]),
+            (["computer", "-h"], ["computer"]),
+            ([], []),
+        )
+    )
+    def test_should_resolve_stop_at_parser_with_arguments(
+            self, docker_tree, args, expected_path
+    ):
+        parser, remaining = docker_tree.resolve(args)
+        assert parser is docker_tree.get_cmd_by_path(expected_path)['cmd']
+        assert list(remaining) == args[len(expected_path):]
+
+    @pytest.mark.parametrize(
+        "args",
+        (
+            ["computer", "disks", "show", "1"],
+            ["docker", "0.0.0.0", "run", "c1"],
+            ["docker", "0.0.0.0", "run", "c1", "--port", "8080"],
+            ["g", "echo", "@args.txt"],
+        )
+    )
+    @pytest.mark.parametrize("fromfile_prefix_chars", (None, "@"))
+    def test_should_dispatch_return_same_result_as_root(
+            self, docker_tree, args, fromfile_prefix_chars, tmpdir,
+            monkeypatch
+    ):
+        tmpdir.join("args.txt").write("hello\n")
+        monkeypatch.chdir(tmpdir)
+        docker_tree.root.fromfile_prefix_chars = fromfile_prefix_chars
+        assert docker_tree.dispatch(args) == docker_tree.root.run(args)
+
+    def test_should_dispatch_raise_error_like_root(self, docker_tree):
+        from cmdtree.exceptions import ArgumentParseError
+        from cmdtree.registry import env
+        env.silent_exit = False
+        with pytest.raises(ArgumentParseError):
+            docker_tree.dispatch(["computer", "disks", "fake"])
+        env.silent_exit = True
+
+
+def test_should_add_commands_accept_lazy_reference():
+    from cmdtree.lazy import LazyFunc
+    from cmdtree.tree import CmdTree
+    tree = CmdTree(lazy=True)
+    tree.add_commands(["path", "join"], "os.path:join").argument("a")
+    func = tree.get_cmd_by_path(["path", "join"])['cmd'].func
+    assert isinstance(func, LazyFunc)
+    assert not func.resolved
+    assert tree.dispatch(["path", "join", "name"]) == "name"
+    assert func.resolved
+
+
+def test_should_add_parent_commands_allow_repeated_names(cmd_tree):
+    cmd_tree.add_parent_commands(["db", "db", "db"])
+    node = cmd_tree.get_cmd_by_path(["db", "db", "db"])
+    assert node.path == ("db", "db", "db")
+    assert list(cmd_tree.tree['children']) == ["db"]
+    assert cmd_tree.index_in_tree(["db", "db", "db", "db"]) == 3
+
+
+def test_should_index_nodes_by_path(cmd_tree_with_tree):
+    from cmdtree.tree import CmdNode
+    node = cmd_tree_with_tree.nodes[("new_cmd", "child_cmd")]
+    assert isinstance(node, CmdNode)
+    assert node is cmd_tree_with_tree.get_cmd_by_path(
+        ["new_cmd", "child_cmd"]
+    )
+    assert dict(node) == {
+        "name": "child_cmd",
+        "cmd": "cmd_obj",
+        "children": {},
+    }
+
+
+def test_freeze_should_build_tree_and_reject_new_commands(docker_tree):
+    docker_tree.freeze()
+    for node in docker_tree.nodes.values():
+        assert getattr(node.cmd, "materialized", True)
+    assert docker_tree.add_parent_commands(["docker"])['name'] == "docker"
+    with pytest.raises(RuntimeError):
+        docker_tree.add_commands(["docker", "stop"], lambda: None)
+    with pytest.raises(RuntimeError):
+        docker_tree.add_parent_commands(["network"])
+
+
+def test_lazy_tree_should_be_built_once_by_concurrent_dispatches():
+    from concurrent.futures import ThreadPoolExecutor
+    from cmdtree import spec
+    commands = dict(
+        ("cmd%d" % index, {"func": "os.path:basename"})
+        for index in range(50)
+    )
+    tree = spec.load({"commands": {"group": {"commands": commands}}})
+    tree.get_cmd_by_path([])['cmd'].option("p", default="/a/b")
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(
+            tree.root.run,
+            [["--p", "/x/%d" % index, "group", "cmd%d" % index]
+             for index in range(50)],
+        ))
+    assert results == [str(index) for index in range(50)]
+
+
+class TestInvoke:
+    @pytest.mark.parametrize(
+        "args, status, token",
+        (
+            (["docker", "0.0.0.0", "run", "c1", "--bogus"], 2, "--bogus"),
+            (["computer", "disks", "fake"], 2, "fake"),
+            (["computer", "disks", "show", "1", "2"], 2, "2"),
+            (["computer", "disks", "show"], 2, None),
+        )
+    )
+    def test_should_return_parse_error_with_token(
+            self, docker_tree, capsys, args, status, token
+    ):
+        from cmdtree.exceptions import ArgumentParseError
+        result = docker_tree.invoke(args)
+        assert result.status == status
+        assert isinstance(result.error, ArgumentParseError)
+        assert result.token == token
+        assert capsys.readouterr() == ("", "")
+
+    def test_should_return_value_and_timings(self, docker_tree):
+        result = docker_tree.invoke(["docker", "0.0.0.0", "run", "c1"])
+        assert result.ok
+        assert result.value == ("0.0.0.0", "c1", 80)
+        assert set(result.timings) == set(["resolve", "parse", "run"])
+
+    @pytest.mark.parametrize(
+        "args",
+        (["computer", "-h"], ["computer", "disks", "show", "1", "-h"])
+    )
+    def test_should_capture_help(self, docker_tree, capsys, args):
+        result = docker_tree.invoke(args)
+        assert result.status == 0
+        assert result.error is None
+        assert "usage:" in result.output
+        assert capsys.readouterr() == ("", "")
+
+    def test_should_return_token_of_invalid_value(self):
+        from cmdtree.tree import CmdTree
+        from cmdtree.types import INT
+        tree = CmdTree()
+        tree.add_commands(["show"], lambda disk_id: disk_id).argument(
+            "disk_id", type=INT
+        )
+        result = tree.invoke(["show", "x"])
+        assert (result.status, result.token) == (2, "x")
+        assert "disk_id" in str(result.error)
+
+    def test_should_return_exit_and_exception_of_command(self):
+        import sys
+        from cmdtree.tree import CmdTree
+        tree = CmdTree()
+        tree.add_commands(["exit"], lambda: sys.exit(3))
+        tree.add_commands(["fail"], lambda: 1 / 0)
+        assert tree.invoke(["exit"]).status == 3
+        result = tree.invoke(["fail"])
+        assert result.status == 1
+        assert isinstance(result.error, ZeroDivisionError)
@@ -3,6 +3,7 @@ from argparse import ArgumentTypeError
 
 import mock
 import pytest
+import six
 
 from cmdtree import types
 
@@ -216,6 +217,316 @@ class TestChoices:
         instance = types.Choices(choices, type=type_)
 
         assert instance() == {
-            "type": type_ or instance.convert,
-            "choices": choices
-        }
\ No newline at end of file
+            "type": instance.convert,
+            "choices": choices,
+        }
+
+    def test_should_return_metavar_for_large_choices(self):
+        instance = types.Choices(list(range(100)))
+        assert instance() == {
+            "type": instance.convert,
+            "metavar": instance.metavar,
+        }
+
+    @pytest.mark.parametrize(
+        "choices, type_, value, expected",
+        (
+            (["hello", "world"], None, "hello", "hello"),
+            ([3, 1, 2], types.INT, "1", 1),
+            ([3, 1, 2], int, "2", 2),
+        )
+    )
+    def test_should_convert_return_choice(self, choices, type_, value, expected):
+        assert types.Choices(choices, type=type_).convert(value) == expected
+
+    def test_should_fail_with_closest_matches(self):
+        instance = types.Choices(["us-east-1", "us-west-1", "eu-west-1"])
+        with pytest.raises(ArgumentTypeError) as e:
+            instance.convert("us-est-1")
+        assert "closest matches:" in str(e.value)
+        assert "'us-east-1'" in str(e.value)
+
+    def test_should_truncate_choices_in_error_and_metavar(self):
+        instance = types.Choices([str(i) for i in range(1000)])
+        with pytest.raises(ArgumentTypeError) as e:
+            instance.convert("hello")
+        assert "... 992 more" in str(e.value)
+        assert instance.metavar == "{0,1,2,3,4,5,6,7,...}"
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        (
+            ("us-w", "us-west-1"),
+            ("us-east-2", "us-east-2"),
+            ("us-e", None),
+            ("eu", None),
+        )
+    )
+    def test_should_accept_unique_prefix(self, value, expected):
+        instance = types.Choices(
+            ["us-east-1", "us-east-2", "us-west-1"], prefix=True
+        )
+        if expected is None:
+            with pytest.raises(ArgumentTypeError):
+                instance.convert(value)
+        else:
+            assert instance.convert(value) == expected
+
+    def test_should_work_with_parser(self):
+        from cmdtree.parser import AParser
+        parser = AParser()
+        parser.argument("host", type=types.Choices(["host1", "host2"]))
+        assert parser.parse_args(["host1"]).host == "host1"
+
+
+class TestRecords:
+    @pytest.fixture()
+    def lines_file(self, tmpdir):
+        path = tmpdir.join("ids.txt")
+        path.write_binary(b"1\r\n2\n3")
+        return str(path)
+
+    def test_should_yield_lines_lazily(self, lines_file):
+        import types as std_types
+        lines = types.STREAM.convert(lines_file)
+        assert isinstance(lines, std_types.GeneratorType)
+        assert list(lines) == [u"1", u"2", u"3"]
+
+    def test_should_convert_each_line(self, lines_file):
+        assert list(types.Lines(type=types.INT).convert(lines_file)) == \
+            [1, 2, 3]
+
+    def test_should_split_records_by_nul(self, tmpdir):
+        path = tmpdir.join("names")
+        path.write_binary(b"a b\0c\nd\0")
+        records = types.Records(chunk_size=2).convert(str(path))
+        assert list(records) == [b"a b", b"c\nd"]
+
+    def test_should_read_stdin(self, monkeypatch):
+        import io
+        monkeypatch.setattr(
+            "sys.stdin", io.TextIOWrapper(io.BytesIO(b"x\ny\n"))
+        )
+        assert list(types.STREAM.convert("-")) == [u"x", u"y"]
+
+    def test_should_fail_on_missing_file(self, tmpdir):
+        with pytest.raises(ArgumentTypeError):
+            types.STREAM.convert(str(tmpdir.join("missing")))
+
+    def test_should_fail_on_bad_record(self, tmpdir):
+        path = tmpdir.join("ids.txt")
+        path.write_binary(b"1\nx\n")
+        lines = types.Lines(type=types.INT).convert(str(path))
+        assert next(lines) == 1
+        with pytest.raises(ArgumentTypeError) as excinfo:
+            next(lines)
+        assert "record 2 of" in str(excinfo.value)
+
+
+class TestMMapFile:
+    @pytest.fixture()
+    def data_file(self, tmpdir):
+        path = tmpdir.join("data.bin")
+        path.write_binary(b"0123456789")
+        return str(path)
+
+    def test_should_map_file(self, data_file):
+        import mmap
+        from cmdtree import resources
+
+        with resources.scope():
+            mapped = types.MMapFile().convert(data_file)
+            assert isinstance(mapped, mmap.mmap)
+            assert mapped[2:5] == b"234"
+        # python 2 map has no closed
+        with pytest.raises(ValueError):
+            mapped[0]
+
+    @pytest.mark.skipif(six.PY2, reason="python 2 can not view a map")
+    def test_should_return_view(self, data_file):
+        from cmdtree import resources
+
+        with resources.scope():
+            view = types.MMapFile(view=True).convert(data_file)
+            assert bytes(view[-2:]) == b"89"
+        with pytest.raises(ValueError):
+            view[0]
+
+    def test_should_return_empty_bytes_for_empty_file(self, tmpdir):
+        path = tmpdir.join("empty")
+        path.write_binary(b"")
+        assert types.MMapFile().convert(str(path)) == b""
+
+    def test_should_read_stdin(self, monkeypatch):
+        import io
+        monkeypatch.setattr(
+            "sys.stdin", io.TextIOWrapper(io.BytesIO(b"data"))
+        )
+        assert types.MMapFile().convert("-") == b"data"
+
+    def test_should_read_pipe(self, tmpdir):
+        import os
+        import threading
+
+        path = str(tmpdir.join("fifo"))
+        os.mkfifo(path)
+
+        def write():
+            with open(path, "wb") as f:
+                f.write(b"piped")
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        assert types.MMapFile().convert(path) == b"piped"
+        writer.join()
+
+    def test_should_fail_on_missing_file(self, tmpdir):
+        with pytest.raises(ArgumentTypeError):
+            types.MMapFile().convert(str(tmpdir.join("missing")))
+
+
+class TestLazyFile:
+    @pytest.fixture()
+    def paths(self, tmpdir):
+        paths = []
+        for index in range(3):
+            path = tmpdir.join("%d.txt" % index)
+            path.write("%d-a\n%d-b\n" % (index, index))
+            paths.append(str(path))
+        return paths
+
+    def test_should_not_open_when_parsed(self, paths):
+        lazy_file = types.LazyFile().convert(paths[0])
+        assert lazy_file._handle is None
+        assert lazy_file.read() == "0-a\n0-b\n"
+        lazy_file.close()
+        assert lazy_file._handle is None
+
+    def test_should_bound_open_files_and_reopen_at_position(self, paths):
+        param_type = types.LazyFile(max_open=2)
+        files = [param_type.convert(path) for path in paths]
+        assert [f.readline() for f in files] == ["0-a\n", "1-a\n", "2-a\n"]
+        assert len(param_type.pool) == 2
+        assert files[0]._handle is None
+        assert [f.readline() for f in files] == ["0-b\n", "1-b\n", "2-b\n"]
+        assert sum(f._handle is not None for f in files) == 2
+        for f in files:
+            f.close()
+        assert len(param_type.pool) == 0
+
+    def test_should_keep_written_data_when_reopened(self, tmpdir):
+        param_type = types.LazyFile("w", max_open=1)
+        first, second = [
+            param_type.convert(str(tmpdir.join(name))) for name in "ab"
+        ]
+        first.write(u"1")
+        second.write(u"2")
+        first.write(u"3")
+        first.close()
+        second.close()
+        assert tmpdir.join("a").read() == "13"
+
+    def test_should_iterate_lines(self, paths):
+        with types.LazyFile().convert(paths[1]) as f:
+            assert list(f) == ["1-a\n", "1-b\n"]
+        with pytest.raises(ValueError):
+            f.read()
+
+    def test_should_fail_on_missing_file(self, tmpdir):
+        with pytest.raises(ArgumentTypeError):
+            types.LazyFile().convert(str(tmpdir.join("missing")))
+
+    def test_should_close_when_dispatch_completes(self, paths):
+        from cmdtree.parser import AParser
+        parser = AParser()
+        parser.add_cmd(
+            "heads", func=lambda files: [(f, f.readline()) for f in files]
+        ).argument("files", type=types.LazyFile(max_open=1), nargs="+")
+        result = parser.run(["heads"] + paths)
+        assert [line for _, line in result] == ["0-a\n", "1-a\n", "2-a\n"]
+        assert all(f.closed and f._handle is None for f, _ in result)
+
+
+class TestCompressedFile:
+    DATA = b"line 1\nline 2\n" * 1000
+
+    @pytest.mark.parametrize("extension", (".gz", ".bz2", ".xz"))
+    def test_should_compress_by_extension_and_detect_by_magic(
+            self, tmpdir, extension
+    ):
+        from cmdtree import resources
+        if extension == ".xz":
+            # python 2 has no lzma
+            pytest.importorskip("lzma")
+        path = str(tmpdir.join("data" + extension))
+        with resources.scope():
+            types.CompressedFile("wb").convert(path).write(self.DATA)
+        with open(path, "rb") as f:
+            assert types.detect_compression(head=f.read(6)) == \
+                types.detect_compression(filename=path)
+        # detected without extension
+        renamed = str(tmpdir.join("renamed"))
+        tmpdir.join("data" + extension).rename(renamed)
+        with resources.scope():
+            f = types.CompressedFile().convert(renamed)
+            assert f.read() == self.DATA
+        assert f.closed
+
+    def test_should_read_text(self, tmpdir):
+        import gzip
+        path = str(tmpdir.join("data.gz"))
+        with gzip.open(path, "wb") as f:
+            f.write(u"é\n".encode("utf-8"))
+        f = types.CompressedFile("r", encoding="utf-8").convert(path)
+        assert list(f) == [u"é\n"]
+        f.close()
+
+    def test_should_read_plain_file(self, tmpdir):
+        path = tmpdir.join("data.gz")
+        path.write_binary(b"plain")
+        f = types.CompressedFile().convert(str(path))
+        assert f.read() == b"plain"
+        f.close()
+
+    def test_should_decompress_stdin(self, monkeypatch):
+        import bz2
+        import io
+        monkeypatch.setattr("sys.stdin", io.TextIOWrapper(
+            io.BufferedReader(io.BytesIO(bz2.compress(self.DATA)))
+        ))
+        f = types.CompressedFile().convert("-")
+        assert f.read() == self.DATA
+
+    def test_should_compress_stdout(self, monkeypatch):
+        import gzip
+        import io
+        out = io.BytesIO()
+        monkeypatch.setattr("sys.stdout", io.TextIOWrapper(out))
+        f = types.CompressedFile("wb", compression="gzip").convert("-")
+        f.write(self.DATA)
+        f.close()
+        assert not out.closed
+        assert gzip.GzipFile(fileobj=io.BytesIO(out.getvalue())).read() == \
+            self.DATA
+
+    def test_should_reject_unknown_compression(self):
+        with pytest.raises(ValueError):
+            types.CompressedFile(compression="zip")
+
+    def test_should_fail_on_missing_file(self, tmpdir):
+        with pytest.raises(ArgumentTypeError):
+            types.CompressedFile().convert(str(tmpdir.join("missing")))
+
+
+class TestPaths:
+    def test_should_yield_entries_of_pattern(self, tmpdir):
+        for name in ("a.gz", "b.gz", "c.txt"):
+            tmpdir.join("logs", name).ensure()
+        entries = types.Paths(prefetch=1).convert(
+            str(tmpdir.join("logs", "*.gz"))
+        )
+        assert sorted(entry.name for entry in entries) == ["a.gz", "b.gz"]
+
+    def test_should_fail_on_missing_path(self, tmpdir):
+        with pytest.raises(ArgumentTypeError):
+            types.Paths().convert(str(tmpdir.join("missing")))
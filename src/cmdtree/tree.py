@@ -1,12 +1,91 @@
-from cmdtree.parser import AParser
+import sys
+
+import six
+
+from cmdtree._compat import Mapping, perf_counter
+from cmdtree.lazy import LazyFunc
+from cmdtree.parser import AParser, build_lock, invoke
+
+
+_EXPANDING = object()
+
+
+class CmdNode(Mapping):
+    """
+    Node of `CmdTree`, also readable as the mapping
+    {"name": cmd_name, "cmd": parser, "children": {name: CmdNode}}
+    which older code works with.
+    """
+    __slots__ = (
+        "name",
+        "cmd",
+        "path",
+        "expander",
+        "_children",
+    )
+    _keys = ("name", "cmd", "children")
+
+    def __init__(self, name, cmd, path=()):
+        """
+        :type path: tuple
+        :param path: command names from root to this node
+        """
+        self.name = name
+        self.cmd = cmd
+        self.path = path
+        # callable adding the children of node to tree, called on
+        # the first access of children.
+        self.expander = None
+        # leaves are the most of nodes, create their dict on demand
+        self._children = None
+
+    @property
+    def children(self):
+        if self.expander is not None:
+            self._expand()
+        if self._children is None:
+            self._children = {}
+        return self._children
+
+    def _expand(self):
+        with build_lock:
+            expander = self.expander
+            # the expanding thread may walk the node again
+            if expander is None or expander is _EXPANDING:
+                return
+            self.expander = _EXPANDING
+            if self._children is None:
+                self._children = {}
+            try:
+                expander(self)
+            finally:
+                self.expander = None
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key == "children":
+            self._children = value
+        else:
+            setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return "CmdNode(%r, %r)" % (self.name, self.cmd)
 
 
 def _mk_cmd_node(cmd_name, cmd_obj):
-    return {
-        "name": cmd_name,
-        "cmd": cmd_obj,
-        "children": {}
-    }
+    return CmdNode(cmd_name, cmd_obj)
 
 
 class CmdTree(object):
@@ -15,51 +94,98 @@ class CmdTree(object):
     ['parent_cmd', 'child_cmd'].
     """
 
-    def __init__(self, root_parser=None):
+    def __init__(self, root_parser=None, lazy=False):
         """
         :type root_parser: cmdtree.parser.AParser
+        :param lazy: if True, parsers of commands and groups will be
+        built when they are first used instead of when they are added.
         """
+        self.lazy = lazy
         if root_parser is not None:
             self.root = root_parser
         else:
             self.root = AParser()
-        self.tree = {
-            "name": "root",
-            "cmd": self.root,
-            "children": {}
-        }
+        self.tree = CmdNode("root", self.root)
+        # {(cmd_name, ...): node}
+        self.nodes = {(): self.tree}
+        self.frozen = False
 
-    def get_cmd_by_path(self, existed_cmd_path):
+    def freeze(self):
         """
-        :return:
-        {
-            "name": cmd_name,
-            "cmd": Resource instance,
-            "children": {}
-        }
+        Build all of the lazy parsers and nodes and reject new commands,
+        so concurrent dispatches of the tree only read it.
+        Arguments of every command are checked against its function.
         """
-        parent = self.tree
-        for cmd_name in existed_cmd_path:
-            try:
-                parent = parent['children'][cmd_name]
-            except KeyError:
-                raise ValueError(
-                    "Given key [%s] in path %s does not exist in tree."
-                    % (cmd_name, existed_cmd_path)
+        nodes = [self.tree]
+        while nodes:
+            node = nodes.pop()
+            parser = node.cmd
+            materialize = getattr(parser, "materialize", None)
+            if materialize is not None:
+                parser = materialize()
+            get_kwargs_map = getattr(parser, "get_kwargs_map", None)
+            if get_kwargs_map is not None:
+                get_kwargs_map()
+            nodes.extend(node.children.values())
+        self.frozen = True
+
+    def _check_not_frozen(self, cmd_path):
+        if self.frozen:
+            raise RuntimeError(
+                "Can not add command `{path}` to a frozen tree".format(
+                    path=" ".join(cmd_path)
                 )
-        return parent
+            )
+
+    def get_cmd_by_path(self, existed_cmd_path):
+        """
+        :rtype: CmdNode
+        """
+        node = self.nodes.get(tuple(existed_cmd_path))
+        if node is not None:
+            return node
+        # walking the path expands the nodes not expanded yet
+        index = self.index_in_tree(existed_cmd_path)
+        if index is None:
+            return self.nodes[tuple(existed_cmd_path)]
+        cmd_name = existed_cmd_path[index]
+        raise ValueError(
+            "Given key [%s] in path %s does not exist in tree."
+            % (cmd_name, existed_cmd_path)
+        )
+
+    def _add_child(self, parent, cmd_node):
+        """
+        :type parent: CmdNode
+        :type cmd_node: CmdNode or dict
+        """
+        if not isinstance(cmd_node, CmdNode):
+            children = cmd_node['children']
+            cmd_node = CmdNode(cmd_node['name'], cmd_node['cmd'])
+        else:
+            children = cmd_node._children
+        cmd_node.path = parent.path + (cmd_node.name, )
+        parent.children[cmd_node.name] = cmd_node
+        self.nodes[cmd_node.path] = cmd_node
+        if children:
+            cmd_node._children = None
+            for child in list(children.values()):
+                self._add_child(cmd_node, child)
+        return cmd_node
 
     def _add_node(self, cmd_node, cmd_path):
         """
+        Add node to the deepest existing node in cmd_path.
+        :type cmd_node: CmdNode or dict
         :type cmd_path: list or tuple
         """
         parent = self.tree
         for cmd_key in cmd_path:
-            if cmd_key not in parent['children']:
+            child = parent.children.get(cmd_key)
+            if child is None:
                 break
-            parent = parent['children'][cmd_key]
-        parent["children"][cmd_node['name']] = cmd_node
-        return cmd_node
+            parent = child
+        return self._add_child(parent, cmd_node)
 
     @staticmethod
     def _get_paths(full_path, end_index):
@@ -70,18 +196,28 @@ class CmdTree(object):
         return new_path, existed_path
 
     def add_commands(self, cmd_path, func, help=None):
+        """
+        :type func: callable or str
+        :param func: the command function or its reference like
+        "package.module:function", the module will not be imported until
+        the command is called.
+        """
+        if isinstance(func, six.string_types):
+            func = LazyFunc(func)
+        self._check_not_frozen(cmd_path)
         cmd_name = cmd_path[-1]
         parent = self.add_parent_commands(cmd_path[:-1])
-        sub_command = parent['cmd'].add_cmd(name=cmd_name, func=func, help=help)
-        node = _mk_cmd_node(cmd_name, sub_command)
-        self._add_node(node, cmd_path=cmd_path)
+        sub_command = parent['cmd'].add_cmd(
+            name=cmd_name, func=func, help=help, lazy=self.lazy,
+        )
+        self._add_child(parent, _mk_cmd_node(cmd_name, sub_command))
         return sub_command
 
     def add_parent_commands(self, cmd_path, help=None):
         """
         Create parent command object in cmd tree then return
         the last parent command object.
-        :rtype: dict
+        :rtype: CmdNode
         """
         existed_cmd_end_index = self.index_in_tree(cmd_path)
         new_path, existed_path = self._get_paths(
@@ -89,22 +225,20 @@ class CmdTree(object):
             existed_cmd_end_index,
         )
         parent_node = self.get_cmd_by_path(existed_path)
+        if new_path:
+            self._check_not_frozen(cmd_path)
 
-        last_one_index = 1
-        new_path_len = len(new_path)
-        _kwargs = {}
-        for cmd_name in new_path:
-            if last_one_index >= new_path_len:
+        last_index = len(new_path) - 1
+        for index, cmd_name in enumerate(new_path):
+            _kwargs = {}
+            if index == last_index:
                 _kwargs['help'] = help
             sub_cmd = parent_node['cmd'].add_cmd(
-                cmd_name, **_kwargs
+                cmd_name, lazy=self.lazy, **_kwargs
             )
-            parent_node = _mk_cmd_node(cmd_name, sub_cmd)
-            self._add_node(
-                parent_node,
-                existed_path + new_path[:new_path.index(cmd_name)]
+            parent_node = self._add_child(
+                parent_node, _mk_cmd_node(cmd_name, sub_cmd)
             )
-            last_one_index += 1
         return parent_node
 
     def index_in_tree(self, cmd_path):
@@ -113,10 +247,65 @@ class CmdTree(object):
         :type cmd_path: list or tuple
         :return: None if cmd_path already indexed in tree.
         """
+        if tuple(cmd_path) in self.nodes:
+            return None
         current_tree = self.tree
-        for key in cmd_path:
-            if key in current_tree['children']:
-                current_tree = current_tree['children'][key]
-            else:
-                return cmd_path.index(key)
+        for index, key in enumerate(cmd_path):
+            child = current_tree.children.get(key)
+            if child is None:
+                return index
+            current_tree = child
         return None
+
+    def resolve(self, args):
+        """
+        Consume the command words at the head of args by walking the
+        tree, stop at the first node whose parser has its own arguments.
+        :type args: list or tuple
+        :return: (parser, remaining args), parsing the remaining args with
+        the parser gives the same result as parsing all args with root.
+        """
+        node = self.tree
+        index = 0
+        args_len = len(args)
+        while index < args_len and node.children:
+            has_arguments = getattr(node.cmd, "has_arguments", None)
+            if has_arguments is None or has_arguments():
+                break
+            child = node.children.get(args[index])
+            if child is None:
+                break
+            node = child
+            index += 1
+        return node.cmd, args[index:]
+
+    def dispatch(self, args=None, namespace=None):
+        """
+        Run the command of args like `root.run` but only parse args with
+        the parsers which have arguments on the command path.
+        """
+        if args is None:
+            args = sys.argv[1:]
+        parser, remaining = self.resolve(args)
+        return parser.run(remaining, namespace)
+
+    def dispatch_async(self, args=None, namespace=None):
+        """
+        Coroutine version of `dispatch`, coroutine commands are awaited
+        on the running loop.
+        """
+        if args is None:
+            args = sys.argv[1:]
+        parser, remaining = self.resolve(args)
+        return parser.run_async(remaining, namespace)
+
+    def invoke(self, args, namespace=None):
+        """
+        Run the command of args like `dispatch`, but never print or
+        exit, see `cmdtree.parser.invoke`.
+        :rtype: cmdtree.parser.Result
+        """
+        start = perf_counter()
+        parser, remaining = self.resolve(args)
+        timings = {"resolve": perf_counter() - start}
+        return invoke(parser, remaining, namespace, timings=timings)
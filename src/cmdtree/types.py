@@ -1,8 +1,21 @@
+import io
+import os
+import sys
+import threading
 from argparse import ArgumentTypeError as ArgTypeError, FileType
+from functools import partial
 
-from six import text_type, PY2
+from six import string_types, text_type, PY2
 
-from ._compat import _get_argv_encoding, get_filesystem_encoding
+from ._compat import OrderedDict, _get_argv_encoding, get_filesystem_encoding
+from .paths import has_magic, iter_paths, resolve_path
+from .resources import register
+from .streams import (
+    DEFAULT_CHUNK_SIZE,
+    decode_arg,
+    iter_file_records,
+    prefetch,
+)
 
 
 class ParamTypeFactory(object):
@@ -11,6 +24,8 @@ class ParamTypeFactory(object):
     """
 
     name = None
+    # hint for shell completion of the value, "file" or None
+    completion = None
 
     def __call__(self):
         """
@@ -158,36 +173,672 @@ class UUIDParameterType(ParamTypeFactory):
 class File(ParamTypeFactory):
 
     name = "filename"
+    completion = "file"
 
     def __init__(self, mode="r", bufsize=-1):
         self.factory = FileType(mode=mode, bufsize=bufsize)
 
     def convert(self, value):
-        return self.factory(value)
+        return self.factory(resolve_path(value))
+
+
+class FilePool(object):
+    """
+    Bound the number of files of `LazyFile` open at once, the least
+    recently used one is closed when one more is opened, and reopened
+    at the same position on its next access.
+    """
+
+    def __init__(self, max_open=64):
+        self.max_open = max_open
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, lazy_file):
+        """
+        Mark lazy_file as the most recently used one.
+        :type lazy_file: LazyOpenFile
+        """
+        with self._lock:
+            files = self._files
+            files.pop(lazy_file, None)
+            files[lazy_file] = None
+            while len(files) > self.max_open:
+                oldest, _ = files.popitem(last=False)
+                oldest._suspend()
+
+    def discard(self, lazy_file):
+        with self._lock:
+            self._files.pop(lazy_file, None)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __getstate__(self):
+        # files open in this process are not part of the pool pickled,
+        # like the one of a type in a snapshot
+        return {"max_open": self.max_open}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_open"])
+
+
+class LazyOpenFile(object):
+    """
+    File which is opened on the first access of its attributes,
+    see `LazyFile`.
+    """
+
+    def __init__(self, name, mode="r", bufsize=-1, encoding=None,
+                 pool=None):
+        """
+        :type pool: FilePool
+        """
+        self.name = name
+        self.mode = mode
+        self.bufsize = bufsize
+        self.encoding = encoding
+        self.pool = pool
+        self.closed = False
+        self._handle = None
+        # position of the file closed by pool
+        self._position = None
+
+    def _open(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        mode = self.mode
+        if self._position is not None and mode[0] in "wx":
+            # do not truncate what is written before
+            mode = "r+b" if "b" in mode else "r+"
+        handle = io.open(self.name, mode, self.bufsize, self.encoding)
+        if self._position is not None:
+            handle.seek(self._position)
+        return handle
+
+    @property
+    def file(self):
+        """
+        The open file, opened or reopened if it is not.
+        """
+        handle = self._handle
+        if handle is None:
+            handle = self._handle = self._open()
+        if self.pool is not None:
+            self.pool.touch(self)
+        return handle
+
+    def _suspend(self):
+        handle = self._handle
+        if handle is None:
+            return
+        self._position = handle.tell()
+        self._handle = None
+        handle.close()
+
+    def close(self):
+        self.closed = True
+        if self.pool is not None:
+            self.pool.discard(self)
+        handle = self._handle
+        self._handle = None
+        if handle is not None:
+            handle.close()
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.file.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    next = __next__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return "<LazyOpenFile name=%r mode=%r>" % (self.name, self.mode)
+
+
+class LazyFile(ParamTypeFactory):
+    """
+    Like `File`, but the file is not opened while parsing, it opens on
+    the first access and at most max_open of the files of this type
+    are open at once. They are closed when the dispatch completes
+    (see `cmdtree.resources`).
+    """
+
+    name = "filename"
+    completion = "file"
+
+    def __init__(self, mode="r", bufsize=-1, encoding=None, max_open=64):
+        self.mode = mode
+        self.bufsize = bufsize
+        self.encoding = encoding
+        self.pool = FilePool(max_open)
+
+    def convert(self, value):
+        if value == "-":
+            return FileType(mode=self.mode, bufsize=self.bufsize)(value)
+        path = resolve_path(value)
+        if self.mode[0] == "r":
+            try:
+                os.stat(path)
+            except OSError as e:
+                self.fail("can't open '%s': %s" % (value, e.strerror))
+        lazy_file = LazyOpenFile(
+            path, self.mode, self.bufsize, self.encoding, self.pool
+        )
+        # parsed out of a dispatch, it is closed by whoever gets it
+        register(lazy_file.close)
+        return lazy_file
+
+    def __repr__(self):
+        return "LazyFile(%r, max_open=%r)" % (self.mode, self.pool.max_open)
+
+
+class MMapFile(ParamTypeFactory):
+    """
+    Read-only memory map of a file, so a command can scan a large file
+    without reading it into memory. The map is closed when the dispatch
+    which parsed it completes (see `cmdtree.resources`).
+    Pipes, other files which can not be mapped and "-" for stdin are
+    read into bytes, an empty file is b"".
+    """
+
+    name = "filename"
+    completion = "file"
+
+    def __init__(self, view=False):
+        """
+        :param view: if True, return a memoryview of the map, which
+        python 2 can not make.
+        """
+        if view and PY2:
+            raise ValueError("memoryview of a map needs python 3")
+        self.view = view
+
+    @staticmethod
+    def _map(f):
+        import mmap
+        import stat
+
+        if not stat.S_ISREG(os.fstat(f.fileno()).st_mode):
+            return None
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can not be mapped
+            return b""
+        except (EnvironmentError, OverflowError):
+            return None
+
+    def _close(self, mapped, view):
+        if view is not None:
+            view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            # views of command are still alive, the map is released
+            # with the last of them
+            pass
+
+    def convert(self, value):
+        if value == "-":
+            stdin = sys.stdin
+            data = getattr(stdin, "buffer", stdin).read()
+            return memoryview(data) if self.view else data
+        try:
+            with open(resolve_path(value), "rb") as f:
+                mapped = self._map(f)
+                if mapped is None:
+                    mapped = f.read()
+        except (IOError, OSError) as e:
+            self.fail("can't open '%s': %s" % (value, e))
+        if isinstance(mapped, bytes):
+            return memoryview(mapped) if self.view else mapped
+        view = memoryview(mapped) if self.view else None
+        # parsed out of a dispatch, it is closed by whoever gets it
+        register(partial(self._close, mapped, view))
+        return mapped if view is None else view
+
+    def __repr__(self):
+        return "MMapFile(view=%r)" % (self.view, )
+
+
+class Records(ParamTypeFactory):
+    """
+    Lazily read records of a file (stdin for "-") split by sep.
+    The value is a generator which reads the file in large chunks,
+    so memory used does not grow with the size of file.
+    """
+
+    name = "filename"
+    completion = "file"
+    strip = None
+
+    def __init__(self, sep=b"\0", type=None, encoding=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param sep: separator of records
+        :type type: ParamTypeFactory or callable
+        :param type: converter of each record, which is decoded first
+        :param encoding: decode records with it, records are bytes if
+        both encoding and type are None.
+        """
+        if isinstance(sep, text_type):
+            sep = sep.encode("latin-1")
+        self.sep = sep
+        self.type = type
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+    def _decode(self, record):
+        if self.encoding is not None:
+            return record.decode(self.encoding)
+        if self.type is not None:
+            return decode_arg(record)
+        return record
+
+    def _convert_record(self, record):
+        if isinstance(self.type, ParamTypeFactory):
+            return self.type.convert(record)
+        return self.type(record)
+
+    def _iter(self, filename):
+        strip = self.strip
+        for index, record in enumerate(iter_file_records(
+                filename, self.sep, self.chunk_size
+        ), 1):
+            if strip is not None and record.endswith(strip):
+                record = record[:-len(strip)]
+            record = self._decode(record)
+            if self.type is None:
+                yield record
+                continue
+            try:
+                yield self._convert_record(record)
+            except (ArgTypeError, TypeError, ValueError) as e:
+                self.fail("record %d of %s: %s" % (index, filename, e))
+
+    def convert(self, value):
+        path = resolve_path(value)
+        if path != "-":
+            # fail at parsing instead of in the middle of command
+            try:
+                open(path, "rb").close()
+            except (IOError, OSError) as e:
+                self.fail("can't open '%s': %s" % (value, e))
+        return self._iter(path)
+
+    def __repr__(self):
+        return "%s(%r, %r)" % (self.__class__.__name__, self.sep, self.type)
+
+
+class Lines(Records):
+    """
+    Lines of a file, decoded like the arguments in argv by default.
+    """
+    strip = b"\r"
+
+    def __init__(self, type=None, encoding=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        super(Lines, self).__init__(
+            b"\n", type=type, encoding=encoding, chunk_size=chunk_size,
+        )
+
+    def _decode(self, record):
+        if self.encoding is not None:
+            return record.decode(self.encoding)
+        return decode_arg(record)
+
+    def __repr__(self):
+        return "Lines(%r)" % (self.type, )
+
+
+# (name, magic bytes, extensions) of compressions `CompressedFile` knows
+COMPRESSIONS = (
+    ("gzip", b"\x1f\x8b", (".gz", ".tgz")),
+    ("bz2", b"BZh", (".bz2", ".tbz2")),
+    ("xz", b"\xfd7zXZ\x00", (".xz", ".txz")),
+)
+
+_MAGIC_SIZE = max(len(magic) for _, magic, _ in COMPRESSIONS)
+
+
+def detect_compression(head=None, filename=None):
+    """
+    :param head: first bytes of a file, detect by magic bytes if given
+    :param filename: else detect by extension of filename
+    :return: name in `COMPRESSIONS` or None
+    """
+    for name, magic, extensions in COMPRESSIONS:
+        if head is not None:
+            if head.startswith(magic):
+                return name
+        elif filename is not None and filename.endswith(extensions):
+            return name
+    return None
+
+
+def _open_codec(compression, target, mode, level=None):
+    """
+    :param target: path or binary file object, which is not closed
+    with the returned file.
+    """
+    kwargs = {}
+    if compression == "gzip":
+        import gzip
+        if level is not None:
+            kwargs['compresslevel'] = level
+        if isinstance(target, string_types):
+            return gzip.GzipFile(filename=target, mode=mode, **kwargs)
+        return gzip.GzipFile(fileobj=target, mode=mode, **kwargs)
+    if compression == "bz2":
+        if PY2:
+            # bz2 of python 2 only opens file names and is not an io file
+            from bz2file import BZ2File
+        else:
+            from bz2 import BZ2File
+        if level is not None:
+            kwargs['compresslevel'] = level
+        return BZ2File(target, mode, **kwargs)
+    import lzma
+    if level is not None and mode[0] != "r":
+        kwargs['preset'] = level
+    return lzma.LZMAFile(target, mode, **kwargs)
+
+
+class CompressedFile(ParamTypeFactory):
+    """
+    Like `File`, but gzip, bz2 and xz files are decompressed as they
+    are read, detected by their magic bytes (also for "-" as stdin).
+    In write mode, output is compressed if the extension of path is
+    one of a compression, or compression is given.
+    Files are read and written through buffers of buffer_size and
+    closed when the dispatch completes (see `cmdtree.resources`).
+    """
+
+    name = "filename"
+    completion = "file"
+
+    def __init__(self, mode="rb", compression=None, level=None,
+                 encoding=None, buffer_size=1024 * 1024):
+        """
+        :param compression: name in `COMPRESSIONS`, None to detect it
+        :param level: compression level of write mode
+        :param encoding: encoding of text mode
+        """
+        if compression is not None and \
+                compression not in [name for name, _, _ in COMPRESSIONS]:
+            raise ValueError(
+                "Unknown compression `{0}`".format(compression)
+            )
+        self.mode = mode
+        self.compression = compression
+        self.level = level
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+
+    def _detect(self, target, reading):
+        if not reading:
+            if isinstance(target, string_types):
+                return detect_compression(filename=target)
+            return None
+        if isinstance(target, string_types):
+            with open(target, "rb") as f:
+                return detect_compression(head=f.read(_MAGIC_SIZE))
+        peek = getattr(target, "peek", None)
+        if peek is None:
+            return None
+        return detect_compression(head=peek(_MAGIC_SIZE)[:_MAGIC_SIZE])
+
+    def _wrap(self, f, reading):
+        if reading:
+            f = io.BufferedReader(f, self.buffer_size)
+        else:
+            f = io.BufferedWriter(f, self.buffer_size)
+        if "b" not in self.mode:
+            f = io.TextIOWrapper(f, encoding=self.encoding)
+        return f
+
+    def convert(self, value):
+        reading = self.mode[0] == "r"
+        if value == "-":
+            stream = sys.stdin if reading else sys.stdout
+            target = getattr(stream, "buffer", stream)
+        else:
+            target = resolve_path(value)
+        try:
+            compression = self.compression or self._detect(target, reading)
+            if compression is None:
+                if value == "-":
+                    return FileType(self.mode)(value)
+                f = io.open(
+                    target, self.mode, self.buffer_size, self.encoding
+                )
+            else:
+                binary_mode = self.mode.replace("t", "").replace("b", "")
+                f = self._wrap(
+                    _open_codec(
+                        compression, target, binary_mode + "b", self.level
+                    ),
+                    reading,
+                )
+        except (IOError, OSError, ImportError) as e:
+            # ImportError if python is built without the codec
+            self.fail("can't open '%s': %s" % (value, e))
+        # closing it writes the end of compressed output
+        register(f.close)
+        return f
+
+    def __repr__(self):
+        return "CompressedFile(%r, %r)" % (self.mode, self.compression)
+
+
+class Paths(ParamTypeFactory):
+    """
+    Entries of a directory, a file or a glob pattern like "logs/**/*.gz"
+    walked lazily by `os.scandir`, see `cmdtree.paths.iter_paths`.
+    Paths are not expanded by shell, and commands use the stat results
+    cached in entries instead of calling `os.stat` again.
+    """
+
+    name = "path"
+    completion = "file"
+
+    def __init__(self, recursive=False, include=None, exclude=None,
+                 kind=None, follow_symlinks=False, prefetch=0):
+        """
+        :param prefetch: if not 0, walk in a thread at most this number
+        of entries ahead of the command.
+        Other arguments are the ones of `cmdtree.paths.iter_paths`.
+        """
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.kind = kind
+        self.follow_symlinks = follow_symlinks
+        self.prefetch = prefetch
+
+    def convert(self, value):
+        path = resolve_path(value)
+        if not has_magic(path) and not os.path.exists(path):
+            self.fail("no such file or directory: '%s'" % value)
+        entries = iter_paths(
+            path,
+            recursive=self.recursive,
+            include=self.include,
+            exclude=self.exclude,
+            kind=self.kind,
+            follow_symlinks=self.follow_symlinks,
+        )
+        if self.prefetch:
+            entries = prefetch(entries, self.prefetch)
+        return entries
+
+    def __repr__(self):
+        return "Paths(recursive=%r)" % (self.recursive, )
+
+
+class _PrefixTrie(object):
+    """
+    Character trie which tells if a prefix matches only one key.
+    Node is a list of [number of keys under the node, one of the keys,
+    the key ends at the node or None, children dict].
+    """
+    __slots__ = ("root", )
+
+    def __init__(self, keys=()):
+        self.root = [0, None, None, {}]
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        node = self.root
+        node[0] += 1
+        node[1] = key
+        for char in key:
+            node = node[3].setdefault(char, [0, None, None, {}])
+            node[0] += 1
+            node[1] = key
+        node[2] = key
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node[3].get(char)
+            if node is None:
+                return None
+        return node
+
+    def unique(self, prefix):
+        """
+        :return: the only key starts with prefix, None if there is not
+        exactly one.
+        """
+        node = self._find(prefix)
+        if node is None or node[0] != 1:
+            return None
+        return node[1]
+
+    def startswith(self, prefix, limit):
+        """
+        :return: at most limit keys start with prefix in sorted order
+        """
+        node = self._find(prefix)
+        stack = [node] if node is not None else []
+        keys = []
+        while stack and len(keys) < limit:
+            node = stack.pop()
+            if node[2] is not None:
+                keys.append(node[2])
+            children = node[3]
+            stack.extend(
+                children[char] for char in sorted(children, reverse=True)
+            )
+        return keys
 
 
 class Choices(UnprocessedParamType):
+    name = "choice"
+    # max number of choices shown in usage and error message
+    max_shown = 8
+    # max number of closest matches shown in error message
+    max_matches = 3
 
-    def __init__(self, choices, type=None):
+    def __init__(self, choices, type=None, prefix=False):
         """
         :type choices: tuple or list
         :type type: callable
         :param type: type convention function for all choices.
         Receives a `func(value)` as its argument.
+        :param prefix: if True, accept any prefix which matches
+        exactly one of the choices.
         """
         assert hasattr(choices, "index")
         self.choices = choices or tuple()
         self.type = type
+        self.prefix = prefix
+        try:
+            self._index = frozenset(self.choices)
+        except TypeError:
+            # unhashable choices, fallback to linear search
+            self._index = self.choices
+        self._trie = None
+        if prefix:
+            self._trie = _PrefixTrie(
+                choice for choice in self.choices
+                if isinstance(choice, string_types)
+            )
 
     def __call__(self):
         """
         Return keyword arguments
         :rtype: dict
         """
-        return {
-            "type": self.type or self.convert,
-            "choices": self.choices
-        }
+        kwargs = {"type": self.convert}
+        if len(self.choices) > self.max_shown:
+            kwargs['metavar'] = self.metavar
+        else:
+            # small choices are shown by argparse in usage and help
+            kwargs['choices'] = self.choices
+        return kwargs
+
+    @property
+    def metavar(self):
+        shown = [str(choice) for choice in self.choices[:self.max_shown]]
+        if len(self.choices) > self.max_shown:
+            shown.append("...")
+        return "{%s}" % ",".join(shown)
+
+    def _convert_type(self, value):
+        if isinstance(self.type, ParamTypeFactory):
+            return self.type.convert(value)
+        return self.type(value)
+
+    def convert(self, value):
+        if self.type is not None:
+            value = self._convert_type(value)
+        if value in self._index:
+            return value
+        if self._trie is not None and isinstance(value, string_types):
+            matched = self._trie.unique(value)
+            if matched is not None:
+                return matched
+        self.fail(self._error_message(value))
+
+    def _error_message(self, value):
+        import difflib
+
+        candidates = []
+        if self._trie is not None and isinstance(value, string_types):
+            candidates = self._trie.startswith(value, self.max_matches)
+        if not candidates:
+            candidates = difflib.get_close_matches(
+                str(value),
+                [str(choice) for choice in self.choices],
+                n=self.max_matches,
+            )
+        if candidates:
+            return "invalid choice: %r (closest matches: %s)" % (
+                value, ", ".join(repr(choice) for choice in candidates)
+            )
+        shown = ", ".join(
+            repr(choice) for choice in self.choices[:self.max_shown]
+        )
+        if len(self.choices) > self.max_shown:
+            shown += ", ... %d more" % (len(self.choices) - self.max_shown)
+        return "invalid choice: %r (choose from %s)" % (value, shown)
 
 
 UNPROCESSED = UnprocessedParamType()
@@ -200,4 +851,6 @@ FLOAT = FloatParamType()
 
 BOOL = BoolParamType()
 
-UUID = UUIDParameterType()
\ No newline at end of file
+UUID = UUIDParameterType()
+
+STREAM = Lines()
@@ -7,6 +7,11 @@ HERE = os.path.abspath(os.path.dirname(__file__))
 install_requires = (
     "argparse",
     "six>=1.10.0",
+    "ordereddict; python_version < '2.7'",
+    # process pool of `--jobs` of mappable arguments
+    "futures; python_version < '3'",
+    # bz2 files of `CompressedFile`
+    "bz2file; python_version < '3'",
 )
 
 setup(